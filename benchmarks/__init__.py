@@ -0,0 +1,8 @@
+"""Benchmarks for KU-Polls.
+
+Run a benchmark from the project root, for example::
+
+    python -m benchmarks.vote_ingestion
+
+Every benchmark works on a throwaway test database, never on db.sqlite3.
+"""
@@ -0,0 +1,140 @@
+"""Load test the ASGI application with the sync and the async views.
+
+Many concurrent clients call ``mysite.asgi.application`` directly,
+without a server or sockets, and the p50/p99 latency of each page is
+reported for both view sets.
+
+    python -m benchmarks.asgi_load --clients 50 --requests 20
+"""
+import argparse
+import asyncio
+import importlib
+import random
+import time
+
+from benchmarks.common import benchmark_database, create_poll, percentile
+
+from django.conf import settings
+from django.test import Client
+from django.urls import clear_url_caches, reverse
+
+from mysite.asgi import application
+
+CSRF_TOKEN = 'b' * 32
+
+
+async def call(path, cookies, method='GET', body=b''):
+    """Send one HTTP request to the ASGI application.
+
+    Returns:
+        int: the response status code
+    """
+    headers = [
+        (b'host', b'testserver'),
+        (b'cookie', '; '.join(f'{k}={v}' for k, v in cookies.items()).encode()),
+    ]
+    if method == 'POST':
+        headers += [
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'x-csrftoken', CSRF_TOKEN.encode()),
+        ]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # the client stays connected
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+async def client(cookies, pages, choice_ids, count, latencies):
+    rng = random.Random()
+    for _ in range(count):
+        name, path = rng.choice(pages)
+        start = time.perf_counter()
+        if name == 'vote':
+            body = f'choice={rng.choice(choice_ids)}'.encode()
+            status = await call(path, cookies, 'POST', body)
+        else:
+            status = await call(path, cookies)
+        latencies[name].append(time.perf_counter() - start)
+        assert status in (200, 302), f"{name} returned {status}"
+
+
+def use_views(async_views):
+    """Route the polls URLs to the sync or the async views."""
+    settings.POLLS_ASYNC_VIEWS = async_views
+    import polls.urls
+    import mysite.urls
+    importlib.reload(polls.urls)
+    importlib.reload(mysite.urls)
+    clear_url_caches()
+
+
+def run(label, sessions, pages, choice_ids, count):
+    latencies = {name: [] for name, _ in pages}
+
+    async def main():
+        await asyncio.gather(*(client(cookies, pages, choice_ids, count, latencies)
+                               for cookies in sessions))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{label}: {total} requests in {elapsed:.2f}s, {total / elapsed:.0f} req/s")
+    for name, samples in latencies.items():
+        if samples:
+            print(f"  {name:>8}  p50 {percentile(samples, 50) * 1000:7.1f} ms"
+                  f"  p99 {percentile(samples, 99) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=20,
+                        help="requests sent by each client")
+    args = parser.parse_args()
+    with benchmark_database():
+        question, choices, users = create_poll(voters=args.clients)
+        sessions = []
+        for user in users:
+            test_client = Client()
+            test_client.force_login(user)
+            sessions.append({
+                settings.SESSION_COOKIE_NAME:
+                    test_client.cookies[settings.SESSION_COOKIE_NAME].value,
+                settings.CSRF_COOKIE_NAME: CSRF_TOKEN,
+            })
+        pages = [
+            ('index', reverse('polls:index')),
+            ('detail', reverse('polls:detail', args=(question.id,))),
+            ('results', reverse('polls:results', args=(question.id,))),
+            ('vote', reverse('polls:vote', args=(question.id,))),
+        ]
+        choice_ids = [choice.id for choice in choices]
+        for label, async_views in (('sync', False), ('async', True)):
+            use_views(async_views)
+            run(label, sessions, pages, choice_ids, args.requests)
+
+
+if __name__ == '__main__':
+    main()
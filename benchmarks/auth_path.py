@@ -0,0 +1,95 @@
+"""Time the authenticated request path under different session profiles.
+
+For each profile a user logs in and then requests the voting form
+repeatedly; login time, queries per request and request times are
+reported. Logins are timed with the default and with a cheap password
+hashing work factor.
+
+    python -m benchmarks.auth_path --requests 500 --iterations 1000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import benchmark_database, create_poll, percentile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.auth import user_cache
+
+PROFILES = [
+    ('db sessions, uncached users',
+     {'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+      'POLLS_USER_CACHE_SIZE': 0}),
+    ('cached_db sessions, cached users',
+     {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'}),
+    ('signed cookies, cached users',
+     {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'}),
+]
+
+
+def time_login(username, password, iterations):
+    """Return the milliseconds a login takes with the given work factor."""
+    with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+        user = User.objects.get(username=username)
+        user.set_password(password)
+        user.save()
+        client = Client()
+        start = time.perf_counter()
+        assert client.login(username=username, password=password)
+        return (time.perf_counter() - start) * 1000
+
+
+def time_requests(url, username, password, requests):
+    """Log in and request url repeatedly.
+
+    Returns:
+        tuple: queries per request and the request times in milliseconds
+    """
+    user_cache.clear()
+    client = Client()
+    assert client.login(username=username, password=password)
+    client.get(url)
+    times = []
+    queries = 0
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(url)
+            times.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+        queries = max(queries, len(context))
+    return queries, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=1000,
+                        help="cheap PASSWORD_HASH_ITERATIONS to compare")
+    args = parser.parse_args()
+    password = 'benchmark-password'
+    with benchmark_database():
+        question, _, users = create_poll(voters=1, prefix='auth')
+        username = users[0].username
+        url = reverse('polls:detail', args=(question.id,))
+        for iterations in (settings.PASSWORD_HASH_ITERATIONS, args.iterations):
+            print(f"login with {iterations} iterations: "
+                  f"{time_login(username, password, iterations):.1f} ms")
+        for label, overrides in PROFILES:
+            with override_settings(**overrides):
+                queries, times = time_requests(url, username, password,
+                                               args.requests)
+            print(f"{label:>34}: {queries} queries  "
+                  f"median {statistics.median(times):6.2f} ms  "
+                  f"p95 {percentile(times, 95):6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Helpers shared by the benchmark scripts."""
+import contextlib
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from polls.models import Question  # noqa: E402
+
+
+@contextlib.contextmanager
+def benchmark_database():
+    """Create the test database for the duration of a benchmark."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_poll(choices=4, voters=50, prefix="voter"):
+    """Create an open question with choices and users able to vote.
+
+    Returns:
+        tuple: the question, its choices and the users
+    """
+    question = Question.objects.create(question_text="Benchmark question?",
+                                       pub_date=timezone.now())
+    poll_choices = [question.choice_set.create(choice_text=f"Choice {i}")
+                    for i in range(choices)]
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}{i}", password="!") for i in range(voters)])
+    return question, poll_choices, users
+
+
+def run_threads(target, args_list):
+    """Run target once per args tuple, each in its own thread.
+
+    Returns:
+        float: wall time in seconds until every thread finished
+    """
+    def run(*args):
+        try:
+            target(*args)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=args) for args in args_list]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def percentile(samples, percent):
+    """Return the given percentile of a list of samples."""
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
@@ -0,0 +1,148 @@
+"""Time every polls page and check its database query budget.
+
+Data of the chosen size is generated, then each page is requested
+through the test client. Query counts and wall times are written to a
+JSON report. The run fails when a page uses more queries than allowed in
+budgets.json, or when --baseline is given and a page got slower than the
+stored report by more than --tolerance.
+
+    python -m benchmarks.endpoints --users 1000 --votes 5000 --report report.json
+    python -m benchmarks.endpoints --baseline report.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import benchmark_database, percentile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.bulk import generate
+from polls.models import Question
+
+BUDGETS = Path(__file__).with_name('budgets.json')
+# not counted, so counts match inside and outside test transactions
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def load_budgets(path=BUDGETS):
+    """Return the maximum number of queries allowed per URL name."""
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def measure_endpoints(client, question, repeat=10):
+    """Request every polls page repeatedly.
+
+    Args:
+        client (Client): a logged in test client
+        question (Question): an open question with at least two choices
+        repeat (int): requests per page
+
+    Returns:
+        dict: per URL name, the most queries of one request and the
+            median and 95th percentile wall time in milliseconds
+    """
+    choice_ids = list(question.choice_set.values_list('pk', flat=True))
+    requests = {
+        'polls:index': lambda i: client.get(reverse('polls:index')),
+        'polls:detail': lambda i: client.get(
+            reverse('polls:detail', args=(question.id,))),
+        'polls:results': lambda i: client.get(
+            reverse('polls:results', args=(question.id,))),
+        'polls:vote': lambda i: client.post(
+            reverse('polls:vote', args=(question.id,)),
+            {'choice': choice_ids[i % len(choice_ids)]}),
+    }
+    report = {}
+    for name, send in requests.items():
+        queries = 0
+        times = []
+        for i in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = send(i)
+                times.append((time.perf_counter() - start) * 1000)
+            assert response.status_code in (200, 302), \
+                f"{name} returned {response.status_code}"
+            queries = max(queries, sum(
+                not query['sql'].startswith(TRANSACTION_CONTROL)
+                for query in context.captured_queries))
+        report[name] = {
+            'queries': queries,
+            'median_ms': round(statistics.median(times), 3),
+            'p95_ms': round(percentile(times, 95), 3),
+        }
+    return report
+
+
+def over_budget(report, budgets):
+    """Return a message for every page that used too many queries."""
+    return [f"{name}: {result['queries']} queries, budget {budgets[name]}"
+            for name, result in report.items()
+            if name in budgets and result['queries'] > budgets[name]]
+
+
+def regressions(report, baseline, tolerance):
+    """Return a message for every page slower or heavier than the baseline."""
+    messages = []
+    for name, result in report.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            messages.append(f"{name}: {result['queries']} queries, "
+                            f"baseline {before['queries']}")
+        if result['median_ms'] > before['median_ms'] * tolerance:
+            messages.append(f"{name}: median {result['median_ms']:.1f} ms, "
+                            f"baseline {before['median_ms']:.1f} ms")
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--choices', type=int, default=4)
+    parser.add_argument('--votes', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20,
+                        help="requests per page")
+    parser.add_argument('--report', help="write the JSON report to this file")
+    parser.add_argument('--baseline', help="compare with this JSON report")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="allowed slowdown factor against the baseline")
+    args = parser.parse_args()
+    scale = {'users': args.users, 'questions': args.questions,
+             'choices': args.choices, 'votes': args.votes}
+    with benchmark_database():
+        generate(password_hash='!', **scale)
+        client = Client()
+        client.force_login(User.objects.first())
+        question = Question.objects.order_by('-pub_date').first()
+        endpoints = measure_endpoints(client, question, args.repeat)
+    for name, result in endpoints.items():
+        print(f"{name:>14}  {result['queries']:3d} queries  "
+              f"median {result['median_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms")
+    if args.report:
+        with open(args.report, 'w') as stream:
+            json.dump({'scale': scale, 'endpoints': endpoints}, stream, indent=2)
+    failures = over_budget(endpoints, load_budgets())
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)['endpoints']
+        failures += regressions(endpoints, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Time to first byte after booting the serve command.
+
+The server is started in a subprocess on the benchmark database, with
+and without warming up before it forks its workers, and a file backed
+cache shared by them. Reported are the time from launch to the first
+response byte, the time to first byte of the first request to each page,
+and the median of later requests.
+
+    python -m benchmarks.startup --workers 4 --questions 50
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import benchmark_database
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+from polls.bulk import generate
+from polls.models import Question
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(port, path, timeout=10):
+    """Request path and return the milliseconds until the first byte."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        start = time.perf_counter()
+        conn.request('GET', path)
+        response = conn.getresponse()
+        elapsed = (time.perf_counter() - start) * 1000
+        response.read()
+        assert response.status in (200, 302), f"{path} returned {response.status}"
+        return elapsed
+    finally:
+        conn.close()
+
+
+def boot(workers, warmup, cache_dir, path):
+    """Start the server and wait for its first response to path.
+
+    Returns:
+        tuple: the server process, its port, the milliseconds from launch
+            to the first response byte and of the request alone
+    """
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{connection.settings_dict['NAME']}",
+               CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+               CACHE_LOCATION=cache_dir,
+               ALLOWED_HOSTS='127.0.0.1',
+               DEBUG='False')
+    command = [sys.executable, 'manage.py', 'serve', '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}']
+    if not warmup:
+        command.append('--no-warmup')
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        try:
+            elapsed = get(port, path)
+            return server, port, (time.perf_counter() - start) * 1000, elapsed
+        except ConnectionRefusedError:
+            if server.poll() is not None:
+                raise RuntimeError("the server exited during startup")
+            time.sleep(0.005)
+
+
+def measure(workers, warmup, paths, requests):
+    """Boot a server and time its first and later requests per path."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        server, port, ttfb, elapsed = boot(workers, warmup, cache_dir, paths[0])
+        try:
+            first = {paths[0]: elapsed}
+            first.update((path, get(port, path)) for path in paths[1:])
+            later = [get(port, path) for _ in range(requests) for path in paths]
+        finally:
+            server.terminate()
+            server.wait()
+    return ttfb, first, statistics.median(later)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes; later pages may reach another worker")
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=20,
+                        help="later requests per page")
+    args = parser.parse_args()
+    with benchmark_database():
+        generate(users=10, questions=args.questions, votes=10, password_hash='!')
+        question = Question.objects.order_by('-pub_date').first()
+        paths = ['/polls/', reverse('polls:results', args=(question.id,)),
+                 reverse('login')]
+        connection.close()
+        for warmup in (False, True):
+            ttfb, first, later = measure(args.workers, warmup, paths, args.requests)
+            label = 'warmed up' if warmup else 'cold'
+            print(f"{label:>9}: boot to first byte {ttfb:7.1f} ms  "
+                  f"later requests median {later:5.2f} ms")
+            for path, elapsed in first.items():
+                print(f"{'':>11}first {path:<24} {elapsed:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
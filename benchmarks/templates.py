@@ -0,0 +1,90 @@
+"""Compare render times of the voting form before and after template caching.
+
+"before" loads and compiles detail.html for every request and renders
+every choice. "after" uses the cached template loader, which Django
+picks when DEBUG is off, and the cached choice list, so only the CSRF
+token and the rest of the form are rendered per request.
+
+    python -m benchmarks.templates --choices 20 --renders 2000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import percentile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_engine(name, loaders):
+    """Return a template engine of the project using the given loaders."""
+    config = settings.TEMPLATES[0]
+    return DjangoTemplates({
+        'NAME': name,
+        'DIRS': config['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': {**config['OPTIONS'], 'loaders': loaders},
+    })
+
+
+def time_renders(engine, context, renders):
+    """Render the voting form repeatedly, each time for a new request.
+
+    Returns:
+        list: wall time of each render in milliseconds
+    """
+    factory = RequestFactory()
+    times = []
+    for _ in range(renders):
+        request = factory.get('/polls/1/')
+        request.user = AnonymousUser()
+        start = time.perf_counter()
+        engine.get_template('polls/detail.html').render(context, request)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--choices', type=int, default=20)
+    parser.add_argument('--renders', type=int, default=2000)
+    args = parser.parse_args()
+    question = Question(pk=1, question_text="Benchmark question?",
+                        pub_date=timezone.now())
+    choices = [Choice(pk=i, question=question, choice_text=f"Choice {i}")
+               for i in range(1, args.choices + 1)]
+    context = {'question': question, 'choices': choices, 'voted': choices[0].pk}
+    cache.clear()
+    runs = {
+        'before': time_renders(
+            make_engine('before', _LOADERS), context,
+            args.renders),
+        'after': time_renders(
+            make_engine('after', [('django.template.loaders.cached.Loader',
+                                   _LOADERS)]),
+            {**context, 'version': 'benchmark',
+             'cache_timeout': settings.POLLS_QUESTION_CACHE_TIMEOUT},
+            args.renders),
+    }
+    for name, times in runs.items():
+        print(f"{name:>6}  median {statistics.median(times):6.3f} ms  "
+              f"p95 {percentile(times, 95):6.3f} ms")
+    speedup = statistics.median(runs['before']) / statistics.median(runs['after'])
+    print(f"{speedup:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compare vote throughput of synchronous and queued ingestion.
+
+Every client thread logs in as its own user and posts votes to the vote
+view. For the queue mode the time until the queue is drained is reported
+as well.
+
+    python -m benchmarks.vote_ingestion --clients 16 --votes 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import benchmark_database, create_poll, run_threads
+
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.ingest import get_queue
+from polls.tallies import find_mismatches
+
+
+def post_votes(user, url, choices, votes):
+    client = Client()
+    client.force_login(user)
+    rng = random.Random(user.pk)
+    for _ in range(votes):
+        client.post(url, {'choice': rng.choice(choices).pk})
+
+
+def run(mode, clients, votes):
+    question, choices, users = create_poll(voters=clients, prefix=mode)
+    url = reverse('polls:vote', args=(question.id,))
+    start = time.perf_counter()
+    elapsed = run_threads(post_votes, [(user, url, choices, votes)
+                                       for user in users])
+    total = clients * votes
+    print(f"{mode:>5}: {total} votes answered in {elapsed:.2f}s, "
+          f"{total / elapsed:.0f} votes/s")
+    if mode == 'queue':
+        queue = get_queue()
+        while len(queue):
+            time.sleep(0.01)
+        written = time.perf_counter() - start
+        print(f"       all votes written after {written:.2f}s, "
+              f"{total / written:.0f} votes/s")
+    assert not find_mismatches(), "tallies are out of date"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--votes', type=int, default=25,
+                        help="votes posted by each client")
+    args = parser.parse_args()
+    with benchmark_database(), tempfile.TemporaryDirectory() as directory:
+        run('sync', args.clients, args.votes)
+        with override_settings(
+                POLLS_VOTE_INGESTION='queue',
+                POLLS_VOTE_QUEUE_PATH=os.path.join(directory, 'queue.sqlite3')):
+            run('queue', args.clients, args.votes)
+
+
+if __name__ == '__main__':
+    main()
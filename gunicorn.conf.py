@@ -0,0 +1,48 @@
+"""Gunicorn settings for serving the site in production.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py
+
+The application is loaded and warmed up once in the arbiter, before the
+workers are forked, so they start with the modules, templates and cached
+polls in place. GUNICORN_BIND, GUNICORN_WORKERS and GUNICORN_THREADS
+override the address, the number of workers and the threads of each.
+
+Live results streams hold a thread for POLLS_RESULTS_STREAM_DURATION, so
+the workers are threaded and the timeout outlasts a stream.
+"""
+import math
+import os
+import sys
+
+import decouple
+
+from mysite.settings import POLLS_RESULTS_STREAM_DURATION
+
+wsgi_app = 'mysite.wsgi:application'
+# decouple.config, as a module-level "config" would be read as a gunicorn setting
+bind = decouple.config('GUNICORN_BIND', default='127.0.0.1:8000')
+workers = decouple.config('GUNICORN_WORKERS', cast=int, default=os.cpu_count() or 1)
+worker_class = 'gthread'
+threads = decouple.config('GUNICORN_THREADS', cast=int, default=8)
+timeout = math.ceil(POLLS_RESULTS_STREAM_DURATION) + 30
+preload_app = True
+
+
+def when_ready(server):
+    """Warm up in the arbiter, after the application was loaded."""
+    from django.core.exceptions import ImproperlyConfigured
+    from django.db import connections
+
+    from polls.warmup import check_shared_cache, warm_up
+
+    try:
+        check_shared_cache(server.cfg.workers)
+    except ImproperlyConfigured as error:
+        server.log.error("%s", error)
+        sys.exit(1)
+    timings = warm_up(server.app.wsgi())
+    server.log.info("Warmed up in %s", ", ".join(
+        f"{step} {seconds * 1000:.0f} ms" for step, seconds in timings.items()))
+    # connections must not be shared with the forked workers
+    connections.close_all()
@@ -0,0 +1,20 @@
+"""SQLite backend that tunes every new connection with PRAGMA statements.
+
+The pragmas are given as ``OPTIONS["pragmas"]``, for example
+``{"journal_mode": "WAL", "busy_timeout": 5000}``.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
@@ -15,6 +15,11 @@ from pathlib import Path
 from decouple import config, Csv
 import os.path
 
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.exceptions import ImproperlyConfigured
+
+from mysite.database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,7 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "polls.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "polls.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -78,12 +85,63 @@ WSGI_APPLICATION = "mysite.wsgi.application"
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
 DATABASES = {
+    "default": database_settings(
+        config("DATABASE_URL", cast=str, default="sqlite:///db.sqlite3"),
+        BASE_DIR,
+        wal=config("SQLITE_WAL", cast=bool, default=True),
+        busy_timeout=config("SQLITE_BUSY_TIMEOUT", cast=int, default=5000),
+        conn_max_age=config("CONN_MAX_AGE", cast=int, default=60),
+    )
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": config("CACHE_BACKEND", cast=str,
+                          default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", cast=str, default="ku-polls"),
     }
 }
 
+# Longest time in seconds the poll index is cached. The cache also expires
+# when the next poll is published or closed.
+POLLS_INDEX_CACHE_TIMEOUT = config("POLLS_INDEX_CACHE_TIMEOUT", cast=int, default=300)
+
+# Longest time in seconds questions, their page versions and the votes of a
+# user are cached. Entries are replaced on every change; the timeout bounds
+# staleness when processes do not share a cache.
+POLLS_QUESTION_CACHE_TIMEOUT = config("POLLS_QUESTION_CACHE_TIMEOUT", cast=int, default=300)
+
+
+# Vote ingestion: "sync" writes every vote during the request, "queue" journals
+# votes in POLLS_VOTE_QUEUE_PATH and writes them to the database in batches.
+POLLS_VOTE_INGESTION = config("POLLS_VOTE_INGESTION", cast=str, default="sync")
+POLLS_VOTE_QUEUE_PATH = config("POLLS_VOTE_QUEUE_PATH", cast=str,
+                               default=str(BASE_DIR / "vote_queue.sqlite3"))
+POLLS_VOTE_QUEUE_BATCH_SIZE = config("POLLS_VOTE_QUEUE_BATCH_SIZE", cast=int, default=500)
+# seconds the queue worker waits when the queue is empty
+POLLS_VOTE_QUEUE_INTERVAL = config("POLLS_VOTE_QUEUE_INTERVAL", cast=float, default=0.5)
+
+
+# Serve the polls pages with the async views of polls.async_views (for ASGI servers).
+POLLS_ASYNC_VIEWS = config("POLLS_ASYNC_VIEWS", cast=bool, default=False)
+
+
+# Live results stream: shortest time in seconds between two recomputations of
+# a question's results and between reads of votes from other processes, time
+# between keepalive comments without votes, and how long one stream lasts
+# before the browser reconnects.
+POLLS_RESULTS_STREAM_INTERVAL = config("POLLS_RESULTS_STREAM_INTERVAL", cast=float, default=0.5)
+POLLS_RESULTS_STREAM_KEEPALIVE = config("POLLS_RESULTS_STREAM_KEEPALIVE", cast=float, default=15)
+POLLS_RESULTS_STREAM_DURATION = config("POLLS_RESULTS_STREAM_DURATION", cast=float, default=300)
+
+# Fraction of polls requests measured by polls.middleware.PerformanceMiddleware
+# and reported at /metrics/ (staff only); 0 disables the middleware.
+POLLS_METRICS_SAMPLE_RATE = config("POLLS_METRICS_SAMPLE_RATE", cast=float, default=0.0)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -98,10 +156,40 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    # username/password authentication
-    'django.contrib.auth.backends.ModelBackend',  
+    # username/password authentication, session users cached per process
+    'polls.auth.CachedModelBackend',
+]
+
+# Users kept in the per-process cache of polls.auth.CachedModelBackend, 0 turns
+# it off, and the seconds a user changed by another process may stay cached.
+POLLS_USER_CACHE_SIZE = config("POLLS_USER_CACHE_SIZE", cast=int, default=1000)
+POLLS_USER_CACHE_TIMEOUT = config("POLLS_USER_CACHE_TIMEOUT", cast=float, default=60)
+
+PASSWORD_HASHERS = [
+    'polls.auth.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
 ]
 
+# PBKDF2 work factor. Lower it only for load tests, where logging in thousands
+# of users should not be dominated by password hashing; that needs
+# LOAD_TEST_ENVIRONMENT on, which must never be set in production.
+LOAD_TEST_ENVIRONMENT = config("LOAD_TEST_ENVIRONMENT", cast=bool, default=False)
+PASSWORD_HASH_ITERATIONS = config("PASSWORD_HASH_ITERATIONS", cast=int,
+                                  default=PBKDF2PasswordHasher.iterations)
+if (not LOAD_TEST_ENVIRONMENT
+        and PASSWORD_HASH_ITERATIONS < PBKDF2PasswordHasher.iterations):
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASH_ITERATIONS must be at least {PBKDF2PasswordHasher.iterations} "
+        "unless LOAD_TEST_ENVIRONMENT is on.")
+
+# Sessions: "django.contrib.sessions.backends.db" stores them in the database,
+# "cached_db" reads them from the cache (use a shared CACHE_BACKEND) and
+# "signed_cookies" keeps them in the browser without any storage.
+SESSION_ENGINE = config("SESSION_ENGINE", default="django.contrib.sessions.backends.db")
+
 # LOGIN_REDIRECT_URL =
 
 # Internationalization
@@ -121,6 +209,20 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# relative paths are taken from the project directory
+STATIC_ROOT = os.path.join(BASE_DIR, config("STATIC_ROOT", default='staticfiles'))
+
+# polls.staticfiles.CompressedManifestStaticFilesStorage gives collected files
+# content hashed names and gzip/brotli variants; run collectstatic after changing it.
+STATICFILES_STORAGE = config(
+    "STATICFILES_STORAGE",
+    default="django.contrib.staticfiles.storage.StaticFilesStorage")
+
+# Serve STATIC_ROOT from the application with polls.middleware.StaticFilesMiddleware,
+# and the seconds browsers may cache files whose names are not hashed.
+POLLS_SERVE_STATIC = config("POLLS_SERVE_STATIC", cast=bool, default=False)
+POLLS_STATIC_MAX_AGE = config("POLLS_STATIC_MAX_AGE", cast=int, default=60)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -17,9 +17,12 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 
+from polls.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('polls/', include('polls.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
+    path('metrics/', metrics, name='metrics'),
     path('', RedirectView.as_view(url='polls/'))
 ]
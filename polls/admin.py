@@ -1,7 +1,114 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import Question, Choice, Vote
+from .models import Question, Choice, Vote, tally_total
 
-admin.site.register(Question)
-admin.site.register(Choice)
-admin.site.register(Vote)
+# unfiltered tables with more rows than this are not counted exactly
+ESTIMATE_THRESHOLD = 100000
+
+
+def estimate_rows(model):
+    """Return the number of rows of a model's table from the planner
+    statistics, or None when the database has none.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s",
+                           [table])
+            row = cursor.fetchone()
+            # -1 until the table has been analyzed
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # the first number of each index's statistics is the row count
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of very large unfiltered tables.
+
+    Counting every row takes long on large tables, and the admin only
+    needs the count to draw page links.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_rows(self.object_list.model)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ChoiceInline(admin.TabularInline):
+    model = Choice
+    extra = 0
+    fields = ('choice_text', 'tally', 'counted_votes')
+    readonly_fields = ('tally', 'counted_votes')
+
+    def get_queryset(self, request):
+        return (super().get_queryset(request)
+                .annotate(tally=tally_total()).with_vote_counts())
+
+    @admin.display(description="Tally")
+    def tally(self, choice):
+        return getattr(choice, 'tally', None)
+
+    @admin.display(description="Votes counted")
+    def counted_votes(self, choice):
+        return getattr(choice, 'num_votes', None)
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    list_display = ('question_text', 'pub_date', 'end_date')
+    list_filter = ('pub_date',)
+    search_fields = ('question_text',)
+    ordering = ('-pub_date', '-id')
+    inlines = [ChoiceInline]
+
+
+@admin.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    list_display = ('choice_text', 'question', 'tally')
+    list_select_related = ('question',)
+    search_fields = ('choice_text',)
+    autocomplete_fields = ('question',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(tally=tally_total())
+
+    @admin.display(description="Tally", ordering='tally')
+    def tally(self, choice):
+        return choice.tally
+
+
+@admin.register(Vote)
+class VoteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'question', 'choice', 'user')
+    list_select_related = ('question', 'choice', 'user')
+    list_filter = ('question',)
+    raw_id_fields = ('choice', 'user')
+    autocomplete_fields = ('question',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    # a filtered list is counted, the whole table is not
+    show_full_result_count = False
+
+    # votes are cast through the polls pages, which keep the tallies right
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
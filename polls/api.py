@@ -0,0 +1,142 @@
+"""Read-only JSON API of the polls.
+
+Questions are paged with a cursor on (pub_date, id) instead of an
+offset, so every page costs the same however deep it is. Rows are read
+with values().
+"""
+import base64
+import binascii
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .broadcast import results_payload
+from .models import Choice, Question, QuestionQuerySet
+from .snapshots import get_snapshot
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+QUESTION_FIELDS = ('id', 'question_text', 'pub_date', 'end_date', 'status')
+STATUSES = (QuestionQuerySet.OPEN, QuestionQuerySet.CLOSED)
+
+
+def encode_cursor(pub_date, pk):
+    """Return the opaque cursor of the page after the given question."""
+    value = f'{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) of a cursor.
+
+    Raises:
+        ValueError: the cursor was not made by encode_cursor()
+    """
+    try:
+        pub_date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+    if pub_date is None:
+        raise ValueError("Invalid cursor.")
+    return pub_date, pk
+
+
+def _published():
+    now = timezone.now()
+    return Question.objects.published(now).with_status(now)
+
+
+def _published_question(pk):
+    """Return a published question with only its dates, or raise Http404."""
+    dates = _published().filter(pk=pk).values('pub_date', 'end_date').first()
+    if dates is None:
+        raise Http404("No question matches the given query.")
+    return Question(pk=pk, **dates)
+
+
+def _bad_request(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def question_list(request):
+    """Return a page of published questions, newest first.
+
+    Args:
+        request : http request with the optional ``cursor``, ``limit``
+            and ``status`` (open or closed) query parameters
+
+    Returns:
+        httpresponse: JSON with the ``results`` and the URL of the ``next``
+            page, or null on the last page
+    """
+    try:
+        limit = min(int(request.GET.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return _bad_request("limit must be a number.")
+    if limit < 1:
+        return _bad_request("limit must be positive.")
+    questions = _published().order_by('-pub_date', '-id')
+    status = request.GET.get('status')
+    if status:
+        if status not in STATUSES:
+            return _bad_request(f"status must be one of {', '.join(STATUSES)}.")
+        questions = questions.filter(status=status)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            pub_date, pk = decode_cursor(cursor)
+        except ValueError as error:
+            return _bad_request(str(error))
+        questions = questions.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+    # one more row tells whether there is a next page
+    rows = list(questions.values(*QUESTION_FIELDS)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        params = {'limit': limit,
+                  'cursor': encode_cursor(last['pub_date'], last['id'])}
+        if status:
+            params['status'] = status
+        next_url = f"{reverse('polls:api_questions')}?{urlencode(params)}"
+    return JsonResponse({'results': rows, 'next': next_url})
+
+
+def question_detail(request, pk):
+    """Return a published question."""
+    question = _published().filter(pk=pk).values(*QUESTION_FIELDS).first()
+    if question is None:
+        raise Http404("No question matches the given query.")
+    return JsonResponse(question)
+
+
+def choice_list(request, pk):
+    """Return the choices of a published question.
+
+    Not streamed, since Django runs the iterator of a streaming response
+    in the event loop of an ASGI server, where queries are not allowed.
+    """
+    _published_question(pk)
+    rows = Choice.objects.filter(question_id=pk).order_by('pk').values(
+        'id', 'choice_text')
+    return JsonResponse({'question': pk, 'results': list(rows)})
+
+
+def results(request, pk):
+    """Return the vote counts and percentages of a published question.
+
+    Closed questions are answered from their results snapshot.
+    """
+    question = _published_question(pk)
+    if question.is_closed():
+        payload = get_snapshot(question).results
+    else:
+        payload = results_payload(pk)
+    return JsonResponse({'question': pk, **payload})
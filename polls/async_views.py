@@ -0,0 +1,132 @@
+"""Asynchronous versions of the polls views for ASGI servers.
+
+They are used instead of the views in ``polls.views`` when
+``POLLS_ASYNC_VIEWS`` is set. Database work goes through Django's async
+ORM interface; only the session/user lookup and the transactional vote
+write run in a worker thread.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import render
+from django.urls import reverse
+from django.views import generic
+
+from .cache import aget_index_questions
+from .ingest import enqueue_vote
+from .models import Choice, Question, Vote
+from .services import record_vote
+from .snapshots import add_snapshot_headers, get_snapshot, not_modified
+
+
+@sync_to_async
+def get_user(request):
+    """Return the logged in user, or None for an anonymous request."""
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def get_question(pk):
+    """Return the question with the given primary key or raise Http404."""
+    try:
+        return await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404("No question matches the given query.")
+
+
+class IndexView(generic.View):
+    """View for index.html page."""
+
+    async def get(self, request):
+        questions = await aget_index_questions()
+        # the template greets the user
+        await get_user(request)
+        return render(request, 'polls/index.html', {
+            'latest_question_list': questions,
+        })
+
+
+class DetailView(generic.View):
+    """View for detail.html page."""
+
+    async def get(self, request, pk):
+        """Render the voting form, or redirect to the index when voting is
+        not allowed or the question does not exist.
+        """
+        user = await get_user(request)
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        try:
+            question = await Question.objects.aget(pk=pk)
+        except Question.DoesNotExist:
+            messages.error(request, "Question does not exist.")
+            return HttpResponseRedirect(reverse('polls:index'))
+        if not question.can_vote():
+            messages.error(request, "Voting is not allowed at this time.")
+            return HttpResponseRedirect(reverse('polls:index'))
+        voted = await Vote.objects.filter(
+            user=user, question=question
+        ).values_list('choice_id', flat=True).afirst()
+        return render(request, 'polls/detail.html', {
+            'question': question,
+            'choices': [choice async for choice in question.choice_set.all()],
+            'voted': voted,
+        })
+
+
+class ResultsView(generic.View):
+    """View for results.html page."""
+
+    async def get(self, request, pk):
+        response = not_modified(request, pk)
+        if response is not None:
+            return response
+        question = await get_question(pk)
+        if not question.is_closed():
+            return render(request, 'polls/results.html', {
+                'question': question,
+                'results': await question.aresults(),
+            })
+        snapshot = await sync_to_async(get_snapshot)(question)
+        response = render(request, 'polls/results.html', {
+            'question': question,
+            'results': snapshot.as_results(),
+            'closed': True,
+        })
+        return add_snapshot_headers(response, snapshot.etag, snapshot.created)
+
+
+async def vote(request, question_id):
+    """Handle a vote request from vote button at detail page.
+
+    Args:
+        request : http request
+        question_id (int): question id
+
+    Returns:
+        httpresponse: response for the request
+    """
+    user = await get_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    question = await get_question(question_id)
+    if not question.can_vote():
+        messages.error(request, "Voting is not allowed at this time.")
+        return HttpResponseRedirect(reverse('polls:index'))
+    try:
+        selected_choice = await question.choice_set.aget(
+            pk=request.POST['choice'])
+    except (KeyError, Choice.DoesNotExist):
+        return render(request, 'polls/detail.html', {
+            'question': question,
+            'choices': [choice async for choice in question.choice_set.all()],
+            'error_message': "You didn't select a choice.",
+        })
+    # the vote is written in a transaction, which needs a synchronous context
+    if settings.POLLS_VOTE_INGESTION == 'queue':
+        await sync_to_async(enqueue_vote)(user, selected_choice)
+    else:
+        await sync_to_async(record_vote)(user, selected_choice)
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
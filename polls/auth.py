@@ -0,0 +1,116 @@
+"""Fast path of authentication for vote-heavy traffic.
+
+Every authenticated request loads its user. CachedModelBackend keeps
+recently seen users in a per-process LRU cache, checked against a
+version in the shared cache, and the tunable hasher lets load-test
+environments make logins cheaper.
+"""
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+USER_VERSION_CACHE_KEY = 'polls:user-version:{}'
+
+
+class UserCache:
+    """Thread-safe LRU cache of users by primary key.
+
+    Size and timeout come from POLLS_USER_CACHE_SIZE and
+    POLLS_USER_CACHE_TIMEOUT. Each user is stored with the version it
+    had in the shared cache, which discard() changes, so saved and
+    deleted users are reloaded by every process sharing that cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # primary key -> (expiry time, version, user)
+        self._users = OrderedDict()
+
+    def version(self, pk):
+        """Return the shared version of a user, creating it if needed."""
+        key = USER_VERSION_CACHE_KEY.format(pk)
+        version = cache.get(key)
+        if version is None:
+            version = secrets.token_hex(8)
+            # a concurrent request may have stored a version already
+            cache.add(key, version, None)
+            version = cache.get(key, version)
+        return version
+
+    def get(self, pk, version):
+        """Return a copy of the cached user of this version, or None."""
+        with self._lock:
+            entry = self._users.get(pk)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[1] != version:
+                del self._users[pk]
+                return None
+            self._users.move_to_end(pk)
+            user = entry[2]
+        # requests must not share one instance
+        return copy.copy(user)
+
+    def set(self, pk, user, version):
+        """Cache a user loaded after its version was read."""
+        size = settings.POLLS_USER_CACHE_SIZE
+        if size <= 0:
+            return
+        expires = time.monotonic() + settings.POLLS_USER_CACHE_TIMEOUT
+        with self._lock:
+            self._users[pk] = (expires, version, copy.copy(user))
+            self._users.move_to_end(pk)
+            while len(self._users) > size:
+                self._users.popitem(last=False)
+
+    def discard(self, pk):
+        """Drop a user here and make other processes reload it."""
+        cache.delete(USER_VERSION_CACHE_KEY.format(pk))
+        with self._lock:
+            self._users.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the users of sessions from user_cache."""
+
+    def get_user(self, user_id):
+        try:
+            pk = get_user_model()._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        version = user_cache.version(pk)
+        user = user_cache.get(pk, version)
+        if user is None:
+            user = super().get_user(pk)
+            if user is None:
+                return None
+            user_cache.set(pk, user, version)
+        return user if self.user_can_authenticate(user) else None
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the work factor set by PASSWORD_HASH_ITERATIONS.
+
+    It keeps the algorithm name, so stored hashes stay valid, and hashes
+    with another work factor are rehashed at the next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
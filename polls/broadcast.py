@@ -0,0 +1,180 @@
+"""Broadcasting of live poll results.
+
+Votes publish an event for their question. Watchers of the results
+stream share one results snapshot per question, which is recomputed at
+most once per ``POLLS_RESULTS_STREAM_INTERVAL`` however many votes and
+watchers there are. Events also bump a counter in the shared cache,
+which waiting watchers read once per interval to hear of votes recorded
+by other processes.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question
+
+RESULTS_VERSION_CACHE_KEY = 'polls:results-version:{}'
+
+
+def results_payload(question_id):
+    """Return the results of a question as JSON-serializable data."""
+    results = Question(pk=question_id).results()
+    return {
+        'total': results['total'],
+        'choices': [{
+            'id': choice.id,
+            'text': choice.choice_text,
+            'votes': choice.num_votes,
+            'percentage': choice.percentage,
+        } for choice in results['choices']],
+    }
+
+
+class ResultsBroadcaster:
+    """Coalesces vote events into shared results snapshots."""
+
+    def __init__(self, compute=results_payload, interval=None):
+        self.compute = compute
+        self._interval = interval
+        self._condition = threading.Condition()
+        self._versions = defaultdict(int)
+        # question id -> (version, computed at, payload)
+        self._snapshots = {}
+        self._computing = set()
+        # question id -> (shared counter last seen, read at)
+        self._shared = {}
+
+    @property
+    def interval(self):
+        if self._interval is None:
+            return settings.POLLS_RESULTS_STREAM_INTERVAL
+        return self._interval
+
+    def publish(self, question_id):
+        """Announce that the results of a question changed."""
+        key = RESULTS_VERSION_CACHE_KEY.format(question_id)
+        cache.add(key, 0, None)
+        try:
+            shared = cache.incr(key)
+        except ValueError:
+            # evicted in between; the next event counts again
+            shared = None
+        with self._condition:
+            self._versions[question_id] += 1
+            seen = self._shared.get(question_id)
+            if shared is not None and (seen is None or seen[0] == shared - 1):
+                # our own event, not one to hear of from the cache again
+                self._shared[question_id] = (shared, time.monotonic())
+            self._condition.notify_all()
+
+    def wait_for_change(self, question_id, version, timeout):
+        """Wait until the question moves past version or timeout passes.
+
+        Events of other processes are noticed within an interval.
+
+        Returns:
+            int: the current version of the question
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.refresh(question_id)
+            with self._condition:
+                remaining = deadline - time.monotonic()
+                self._condition.wait_for(
+                    lambda: self._versions[question_id] != version,
+                    min(remaining, self.interval))
+                if self._versions[question_id] != version or remaining <= self.interval:
+                    return self._versions[question_id]
+
+    def refresh(self, question_id):
+        """Count an event if the shared counter moved since last read.
+
+        Call it before snapshot() to include the votes of other processes;
+        the cache is read at most once per interval.
+        """
+        with self._condition:
+            seen = self._shared.get(question_id)
+            if seen is not None and time.monotonic() - seen[1] < self.interval:
+                return
+            # one watcher reads the cache per interval
+            self._shared[question_id] = (seen[0] if seen else None, time.monotonic())
+        shared = cache.get(RESULTS_VERSION_CACHE_KEY.format(question_id))
+        with self._condition:
+            # without an earlier read, only results computed before are suspect
+            if (shared != seen[0] if seen is not None
+                    else question_id in self._snapshots):
+                self._versions[question_id] += 1
+                self._condition.notify_all()
+            self._shared[question_id] = (shared, time.monotonic())
+
+    def snapshot(self, question_id):
+        """Return the latest results of a question.
+
+        Concurrent callers wait for a single computation, and results
+        are not recomputed more often than once per interval.
+
+        Returns:
+            tuple: the version the results include and the payload
+        """
+        with self._condition:
+            while True:
+                version = self._versions[question_id]
+                cached = self._snapshots.get(question_id)
+                if cached is not None and cached[0] == version:
+                    return cached[0], cached[2]
+                if question_id in self._computing:
+                    self._condition.wait()
+                    continue
+                delay = cached[1] + self.interval - time.monotonic() if cached else 0
+                if delay > 0:
+                    # let more events arrive before recomputing
+                    self._condition.wait(delay)
+                    continue
+                self._computing.add(question_id)
+                break
+        try:
+            payload = self.compute(question_id)
+        except BaseException:
+            with self._condition:
+                self._computing.discard(question_id)
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            self._snapshots[question_id] = (version, time.monotonic(), payload)
+            self._computing.discard(question_id)
+            self._condition.notify_all()
+        return version, payload
+
+    def stream(self, question_id, duration=None, keepalive=None):
+        """Yield server-sent events with the results of a question.
+
+        An event is sent at once and then whenever the results change,
+        with a comment every keepalive seconds without changes. The
+        stream ends after duration seconds; browsers reconnect by
+        themselves.
+        """
+        if duration is None:
+            duration = settings.POLLS_RESULTS_STREAM_DURATION
+        if keepalive is None:
+            keepalive = settings.POLLS_RESULTS_STREAM_KEEPALIVE
+        deadline = time.monotonic() + duration
+        last_payload = None
+        yield 'retry: 1000\n\n'
+        while True:
+            version, payload = self.snapshot(question_id)
+            if payload != last_payload:
+                last_payload = payload
+                yield f'event: results\ndata: {json.dumps(payload)}\n\n'
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            timeout = min(keepalive, remaining)
+            if self.wait_for_change(question_id, version, timeout) == version:
+                yield ': keepalive\n\n'
+
+
+broadcaster = ResultsBroadcaster()
@@ -0,0 +1,248 @@
+"""Fast loading of fixtures and synthetic data for large polls.
+
+Objects are read from the fixture files incrementally and written with
+bulk_create in batches, so memory use does not grow with the file size.
+Vote tallies are updated once at the end instead of per vote.
+"""
+import datetime
+import json
+import random
+import re
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Choice, Question, Vote, VoteEvent
+from .services import add_to_tally
+from .snapshots import discard_snapshot
+from .tallies import rebuild_tallies
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = re.compile(r'\s*')
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+def iter_json_objects(path):
+    """Yield the objects of a JSON array file or of a JSON Lines file.
+
+    The file is decoded one chunk at a time, so only the object being
+    parsed is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as stream:
+        buffer = stream.read(CHUNK_SIZE)
+        pos = WHITESPACE.match(buffer).end()
+        in_array = buffer.startswith('[', pos)
+        if in_array:
+            pos += 1
+        separator = SEPARATOR if in_array else WHITESPACE
+        while True:
+            pos = separator.match(buffer, pos).end()
+            if in_array and buffer.startswith(']', pos):
+                return
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the next object continues in the next chunk
+                chunk = stream.read(CHUNK_SIZE)
+                if chunk:
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                    continue
+                if pos < len(buffer):
+                    raise
+                return
+            yield obj
+
+
+class FixtureLoader:
+    """Write fixture objects ({"model", "pk", "fields"}) in batches.
+
+    Args:
+        batch_size (int): rows per INSERT
+        password_hash (str): password of users without one in the fixture
+    """
+
+    def __init__(self, batch_size=1000, password_hash=None):
+        self.batch_size = batch_size
+        self.password_hash = password_hash
+        self.pending = defaultdict(list)
+        self.many_to_many = defaultdict(list)
+        self.counts = Counter()
+
+    def add(self, data):
+        """Queue one fixture object, writing its model's batch when full."""
+        model = apps.get_model(data['model'])
+        values = {}
+        for name, value in data.get('fields', {}).items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                if value:
+                    self.many_to_many[field].append((data.get('pk'), value))
+                continue
+            if field.is_relation:
+                values[field.attname] = value
+            else:
+                values[name] = field.to_python(value)
+        if model is User and not values.get('password'):
+            values['password'] = self.password_hash or make_password(None)
+        obj = model(pk=data.get('pk'), **values)
+        self.pending[model].append(obj)
+        if len(self.pending[model]) >= self.batch_size:
+            self._write(model)
+
+    def finish(self):
+        """Write the remaining objects and relations and fix sequences."""
+        for model in list(self.pending):
+            self._write(model)
+        for field, rows in self.many_to_many.items():
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            through.objects.bulk_create(
+                [through(**{source: pk, target: other})
+                 for pk, others in rows for other in others],
+                batch_size=self.batch_size)
+        models = [apps.get_model(label) for label in self.counts]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def _write(self, model):
+        objs = self.pending.pop(model, [])
+        if model is Vote:
+            _fill_vote_questions(objs)
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if model is Vote:
+            _log_votes(objs, self.batch_size)
+        self.counts[model._meta.label] += len(objs)
+
+
+def _fill_vote_questions(votes):
+    """Set the question of votes from older fixtures that lack it."""
+    missing = {vote.choice_id for vote in votes if vote.question_id is None}
+    if missing:
+        questions = dict(Choice.objects.filter(pk__in=missing)
+                         .values_list('pk', 'question_id'))
+        for vote in votes:
+            if vote.question_id is None:
+                vote.question_id = questions[vote.choice_id]
+
+
+def _log_votes(votes, batch_size):
+    """Append the vote events of loaded votes, as first votes."""
+    VoteEvent.objects.bulk_create(
+        [VoteEvent(user_id=vote.user_id, question_id=vote.question_id,
+                   new_choice_id=vote.choice_id) for vote in votes],
+        batch_size=batch_size)
+
+
+def load_fixtures(paths, batch_size=1000, password_hash=None):
+    """Load fixture files in one transaction and rebuild the vote tallies.
+
+    Returns:
+        Counter: number of objects loaded per model label
+    """
+    loader = FixtureLoader(batch_size, password_hash)
+    with transaction.atomic():
+        for path in paths:
+            for data in iter_json_objects(path):
+                loader.add(data)
+        loader.finish()
+        if loader.counts['polls.Vote'] or loader.counts['polls.Choice']:
+            rebuild_tallies()
+    return loader.counts
+
+
+def generate(users=0, questions=0, choices=4, votes=0, batch_size=1000,
+             password_hash=None, prefix='user', seed=0):
+    """Create synthetic users, open questions, choices and votes.
+
+    Every vote is cast by a different (user, question) pair, so votes
+    may not exceed users times questions (new and existing ones), less
+    the pairs that voted already.
+
+    Returns:
+        Counter: number of objects created per model label
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    counts = Counter()
+    password_hash = password_hash or make_password(None)
+    with transaction.atomic():
+        new_users = _bulk_create(User, [
+            User(username=f'{prefix}{i}', password=password_hash, date_joined=now)
+            for i in range(users)], batch_size)
+        new_questions = _bulk_create(Question, [
+            Question(question_text=f'Synthetic question {i}?',
+                     pub_date=now - datetime.timedelta(seconds=i))
+            for i in range(questions)], batch_size)
+        question_choices = defaultdict(list)
+        for choice in _bulk_create(Choice, [
+                Choice(question=question, choice_text=f'Choice {i}')
+                for question in new_questions for i in range(choices)],
+                batch_size):
+            question_choices[choice.question_id].append(choice)
+        counts.update({'auth.User': len(new_users),
+                       'polls.Question': len(new_questions),
+                       'polls.Choice': len(question_choices) * choices})
+        if votes:
+            voters = new_users or list(User.objects.order_by('pk'))
+            polls = list(question_choices.values()) or _existing_choices()
+            taken = set()
+            if not question_choices:
+                taken = set(Vote.objects.values_list('user_id', 'question_id'))
+            pairs = [(voter, poll) for poll in polls for voter in voters
+                     if (voter.pk, poll[0].question_id) not in taken]
+            if votes > len(pairs):
+                raise ValueError(
+                    f"{votes} votes need more than the {len(pairs)} pairs of "
+                    f"{len(voters)} users and {len(polls)} questions without a vote")
+            tallies = Counter()
+            voted = set()
+            batch = []
+            for voter, poll in pairs[:votes]:
+                choice = rng.choice(poll)
+                tallies[choice.pk] += 1
+                voted.add(choice.question_id)
+                batch.append(Vote(user_id=voter.pk,
+                                  question_id=choice.question_id,
+                                  choice_id=choice.pk))
+                if len(batch) == batch_size:
+                    Vote.objects.bulk_create(batch)
+                    _log_votes(batch, batch_size)
+                    batch = []
+            Vote.objects.bulk_create(batch)
+            _log_votes(batch, batch_size)
+            counts['polls.Vote'] = votes
+            for choice_id, amount in tallies.items():
+                add_to_tally(choice_id, amount)
+            if not question_choices:
+                # votes were added to existing, possibly closed, questions
+                for question_id in voted:
+                    discard_snapshot(question_id)
+    return counts
+
+
+def _bulk_create(model, objs, batch_size):
+    """bulk_create returning objects with their primary keys set."""
+    if not objs:
+        return []
+    created = model.objects.bulk_create(objs, batch_size=batch_size)
+    if created[0].pk is None:
+        # the database cannot return the new keys of a bulk insert
+        return list(model.objects.order_by('-pk')[:len(objs)])[::-1]
+    return created
+
+
+def _existing_choices():
+    polls = defaultdict(list)
+    for choice in Choice.objects.order_by('question_id', 'pk'):
+        polls[choice.question_id].append(choice)
+    return list(polls.values())
@@ -0,0 +1,186 @@
+"""Cached data for the polls pages."""
+import math
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from .metrics import record_cache
+from .models import Question, Vote
+
+INDEX_CACHE_KEY = 'polls:index'
+INDEX_SIZE = 5
+VERSION_CACHE_KEY = 'polls:version:{}'
+QUESTION_CACHE_KEY = 'polls:question:{}'
+MY_VOTE_CACHE_KEY = 'polls:my-vote:{}:{}'
+
+
+def get_index_questions():
+    """Return the latest published questions shown on the index page.
+
+    The list is cached until a question is saved or deleted, or until
+    the next moment a poll is published or closes. Each question has
+    ``voting_open`` annotated.
+    """
+    now = timezone.now()
+    questions = _unexpired(cache.get(INDEX_CACHE_KEY), now)
+    record_cache(questions is not None)
+    if questions is None:
+        questions = list(_published(now))
+        next_pub_date = _upcoming(now).aggregate(
+            next_pub_date=Min('pub_date'))['next_pub_date']
+        expires_at, timeout = _prepare(now, questions, next_pub_date)
+        cache.set(INDEX_CACHE_KEY, (expires_at, questions), timeout)
+    return questions
+
+
+async def aget_index_questions():
+    """Asynchronous version of get_index_questions()."""
+    now = timezone.now()
+    questions = _unexpired(await cache.aget(INDEX_CACHE_KEY), now)
+    record_cache(questions is not None)
+    if questions is None:
+        questions = [question async for question in _published(now)]
+        next_pub_date = (await _upcoming(now).aaggregate(
+            next_pub_date=Min('pub_date')))['next_pub_date']
+        expires_at, timeout = _prepare(now, questions, next_pub_date)
+        await cache.aset(INDEX_CACHE_KEY, (expires_at, questions), timeout)
+    return questions
+
+
+def invalidate_index():
+    """Drop the cached index so the next request rebuilds it."""
+    cache.delete(INDEX_CACHE_KEY)
+
+
+def cached_question_version(question_id):
+    """Return the cached results version of a question, or None.
+
+    Unlike question_version() this never reads the database, so it can
+    answer conditional requests before any query runs.
+    """
+    return cache.get(VERSION_CACHE_KEY.format(question_id))
+
+
+def question_version(question):
+    """Return the results version token and voting dates of a question.
+
+    The token changes whenever the question, its choices or its vote
+    tallies change, so it can stand in for the results page. The voting
+    form has its own token, see get_question_detail().
+
+    Returns:
+        tuple: (token, pub_date, end_date)
+    """
+    key = VERSION_CACHE_KEY.format(question.pk)
+    version = cache.get(key)
+    if version is None:
+        version = (secrets.token_hex(8), question.pub_date, question.end_date)
+        # a concurrent request may have stored a version already
+        cache.add(key, version, settings.POLLS_QUESTION_CACHE_TIMEOUT)
+        version = cache.get(key, version)
+    return version
+
+
+def get_question_detail(pk):
+    """Return a question and its choices as shown on the voting form.
+
+    The version token changes with the question or its choices but not
+    with votes, and keys the rendered choice list.
+
+    Returns:
+        tuple: the question, the list of its choices and a version
+            token, or None when there is no such question
+    """
+    key = QUESTION_CACHE_KEY.format(pk)
+    detail = cache.get(key)
+    record_cache(detail is not None)
+    if detail is None:
+        question = Question.objects.filter(pk=pk).first()
+        if question is None:
+            return None
+        detail = (question, list(question.choice_set.order_by('pk')
+                                 .only('question_id', 'choice_text')),
+                  secrets.token_hex(8))
+        cache.set(key, detail, settings.POLLS_QUESTION_CACHE_TIMEOUT)
+    return detail
+
+
+def invalidate_question(question_id):
+    """Forget the cached details and both versions of a question."""
+    cache.delete_many([VERSION_CACHE_KEY.format(question_id),
+                       QUESTION_CACHE_KEY.format(question_id)])
+
+
+def invalidate_results(question_id):
+    """Forget the results version of a question after its tallies change."""
+    cache.delete(VERSION_CACHE_KEY.format(question_id))
+
+
+def get_my_vote(user, question_id):
+    """Return the id of the choice a user voted for on a question, or None."""
+    key = MY_VOTE_CACHE_KEY.format(user.pk, question_id)
+    choice_id = cache.get(key)
+    record_cache(choice_id is not None)
+    if choice_id is None:
+        choice_id = (Vote.objects.filter(user=user, question_id=question_id)
+                     .values_list('choice_id', flat=True).first())
+        # 0 stands for no vote, which is cached as well
+        choice_id = choice_id or 0
+        cache.set(key, choice_id, settings.POLLS_QUESTION_CACHE_TIMEOUT)
+    return choice_id or None
+
+
+def remember_vote(user, choice):
+    """Cache the vote of a user for choice before or after it is written.
+
+    The voting form's ETag includes the cached vote, so the form with
+    the previous vote is not answered as unmodified.
+    """
+    cache.set(MY_VOTE_CACHE_KEY.format(user.pk, choice.question_id), choice.pk,
+              settings.POLLS_QUESTION_CACHE_TIMEOUT)
+
+
+def forget_vote(user_id, question_id):
+    """Drop the cached vote of a user on a question."""
+    cache.delete(MY_VOTE_CACHE_KEY.format(user_id, question_id))
+
+
+def _published(now):
+    return Question.objects.published(now).with_status(now).order_by(
+        '-pub_date')[:INDEX_SIZE]
+
+
+def _upcoming(now):
+    return Question.objects.filter(pub_date__gt=now)
+
+
+def _unexpired(cached, now):
+    """Return the cached questions unless the cache entry is stale."""
+    if cached is not None:
+        expires_at, questions = cached
+        if expires_at is None or now < expires_at:
+            return questions
+    return None
+
+
+def _prepare(now, questions, next_pub_date):
+    """Compute when the index next changes.
+
+    The index changes when the next poll is published or a listed poll
+    closes.
+
+    Returns:
+        tuple: the expiry time (or None) and the cache timeout in seconds
+    """
+    boundaries = [question.end_date for question in questions
+                  if question.end_date is not None and question.end_date >= now]
+    if next_pub_date is not None:
+        boundaries.append(next_pub_date)
+    expires_at = min(boundaries, default=None)
+    timeout = settings.POLLS_INDEX_CACHE_TIMEOUT
+    if expires_at is not None:
+        timeout = min(timeout, math.ceil((expires_at - now).total_seconds()))
+    return expires_at, timeout
@@ -0,0 +1,61 @@
+"""Entity tags of the polls pages for conditional GET requests.
+
+Tags are derived from version tokens kept in the cache, so a client
+holding a current copy gets 304 Not Modified before the page's queries
+run or its template is rendered.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _etag(*parts):
+    return '"{}"'.format(hashlib.blake2b(repr(parts).encode(),
+                                         digest_size=16).hexdigest())
+
+
+def _user_parts(user):
+    """The details of the user shown on the pages."""
+    return (user.pk, user.get_username(), getattr(user, 'first_name', ''),
+            getattr(user, 'last_name', ''))
+
+
+def index_etag(request, questions):
+    """Return the ETag of the index page listing questions."""
+    return _etag('index', _user_parts(request.user),
+                 [(question.pk, question.question_text, question.voting_open)
+                  for question in questions])
+
+
+def detail_etag(request, version, voted):
+    """Return the ETag of the voting form of a question for this user.
+
+    The form shows the user's previous vote and carries a CSRF token, so
+    the tag depends on the user, their vote and the CSRF cookie. Votes
+    of other users leave it unchanged.
+
+    Args:
+        request : http request
+        version (str): the token of the question's cached details
+        voted (int): the id of the choice the user voted for, or None
+    """
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if csrf_cookie is None:
+        return None
+    return _etag('detail', version, voted, _user_parts(request.user),
+                 csrf_cookie)
+
+
+def results_etag(version):
+    """Return the ETag of the live results of a question.
+
+    There is none for closed questions, whose results are served from a
+    snapshot with its own validators.
+    """
+    if version is None:
+        return None
+    token, pub_date, end_date = version
+    if end_date is not None and timezone.now() > end_date:
+        return None
+    return _etag('results', token)
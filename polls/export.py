@@ -0,0 +1,72 @@
+"""Streaming export of votes and results as CSV or JSON Lines.
+
+Rows are read with values_list() over the joined tables and an
+iterator, so memory use does not grow with the number of votes.
+"""
+import csv
+import json
+
+from .models import Choice, Vote
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 2000
+
+VOTE_COLUMNS = {
+    'vote_id': 'id',
+    'question_id': 'question_id',
+    'question_text': 'question__question_text',
+    'choice_id': 'choice_id',
+    'choice_text': 'choice__choice_text',
+    'username': 'user__username',
+}
+RESULT_COLUMNS = {
+    'question_id': 'question_id',
+    'question_text': 'question__question_text',
+    'choice_id': 'id',
+    'choice_text': 'choice_text',
+    'votes': 'num_votes',
+}
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, columns, question_ids, chunk_size):
+    if question_ids:
+        queryset = queryset.filter(question_id__in=question_ids)
+    return queryset.order_by('question_id', 'pk').values_list(
+        *columns.values()).iterator(chunk_size=chunk_size)
+
+
+def _lines(columns, rows, fmt):
+    """Yield the header and the rows as lines of the given format."""
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row))) + '\n'
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, use one of {', '.join(FORMATS)}.")
+
+
+def export_votes(question_ids=None, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Yield every vote, optionally of some questions only, as text lines."""
+    return _lines(VOTE_COLUMNS, _rows(Vote.objects, VOTE_COLUMNS,
+                                      question_ids, chunk_size), fmt)
+
+
+def export_results(question_ids=None, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Yield the vote tally of every choice as text lines."""
+    return _lines(RESULT_COLUMNS, _rows(Choice.objects.with_tallies(),
+                                        RESULT_COLUMNS, question_ids,
+                                        chunk_size), fmt)
+
+
+EXPORTS = {'votes': export_votes, 'results': export_results}
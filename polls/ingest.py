@@ -0,0 +1,192 @@
+"""Queued vote ingestion.
+
+When ``POLLS_VOTE_INGESTION`` is ``"queue"`` the vote view appends each
+vote to a journal kept in its own SQLite file and returns at once. A
+worker thread (or the ``flush_vote_queue`` command) writes the journal
+to the database in batches, keeping the last vote of each user on each
+question. Only one of them writes at a time, in every process, so
+batches are applied in journal order.
+"""
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+
+from .cache import remember_vote
+from .services import record_votes
+
+logger = logging.getLogger(__name__)
+
+
+class VoteQueue:
+    """A durable FIFO journal of votes waiting to be written."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS vote_queue ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'user_id INTEGER NOT NULL, '
+                'question_id INTEGER NOT NULL, '
+                'choice_id INTEGER NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS vote_queue_failed ('
+                'seq INTEGER PRIMARY KEY, '
+                'user_id INTEGER NOT NULL, '
+                'question_id INTEGER NOT NULL, '
+                'choice_id INTEGER NOT NULL, '
+                'error TEXT NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _sole_writer(self):
+        """Hold the writer lock of the journal, yielding False when taken.
+
+        The lock is an exclusive transaction on a file next to the
+        journal, so it is released even when its holder dies.
+        """
+        conn = getattr(self._local, 'lock', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path + '.lock', timeout=0,
+                                   isolation_level=None)
+            self._local.lock = conn
+        try:
+            conn.execute('BEGIN EXCLUSIVE')
+        except sqlite3.OperationalError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            conn.execute('ROLLBACK')
+
+    def put(self, user_id, question_id, choice_id):
+        """Append a vote to the journal."""
+        self._connection().execute(
+            'INSERT INTO vote_queue (user_id, question_id, choice_id) '
+            'VALUES (?, ?, ?)', (user_id, question_id, choice_id))
+
+    def peek(self, limit):
+        """Return up to limit of the oldest votes as (seq, user, question, choice)."""
+        return self._connection().execute(
+            'SELECT seq, user_id, question_id, choice_id FROM vote_queue '
+            'ORDER BY seq LIMIT ?', (limit,)).fetchall()
+
+    def remove(self, last_seq):
+        """Forget every vote up to and including last_seq."""
+        self._connection().execute(
+            'DELETE FROM vote_queue WHERE seq <= ?', (last_seq,))
+
+    def fail(self, entry, error):
+        """Set aside a vote that cannot be written, with the reason."""
+        self._connection().execute(
+            'INSERT OR REPLACE INTO vote_queue_failed '
+            '(seq, user_id, question_id, choice_id, error) VALUES (?, ?, ?, ?, ?)',
+            (*entry, str(error)))
+
+    def failed(self):
+        """Return the votes set aside as (seq, user, question, choice, error)."""
+        return self._connection().execute(
+            'SELECT seq, user_id, question_id, choice_id, error '
+            'FROM vote_queue_failed ORDER BY seq').fetchall()
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM vote_queue').fetchone()[0]
+
+    def flush(self, batch_size=None):
+        """Write queued votes to the database one batch at a time.
+
+        A batch leaves the journal only after its transaction committed,
+        so votes survive a crash; replaying a batch is harmless. Votes
+        whose user, question or choice was deleted are set aside in the
+        failed table. Nothing is written while another worker flushes.
+
+        Returns:
+            int: number of journal entries handled
+        """
+        batch_size = batch_size or settings.POLLS_VOTE_QUEUE_BATCH_SIZE
+        written = 0
+        with self._sole_writer() as writer:
+            while writer:
+                batch = self.peek(batch_size)
+                if not batch:
+                    break
+                try:
+                    record_votes([entry[1:] for entry in batch])
+                except IntegrityError:
+                    self._write_each(batch)
+                self.remove(batch[-1][0])
+                written += len(batch)
+        return written
+
+    def _write_each(self, batch):
+        """Write the votes of a failed batch one by one."""
+        for entry in batch:
+            try:
+                record_votes([entry[1:]])
+            except IntegrityError as error:
+                logger.warning("Queued vote %s cannot be written: %s", entry[0], error)
+                self.fail(entry, error)
+
+
+_queue = None
+_worker = None
+_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the vote queue configured by POLLS_VOTE_QUEUE_PATH."""
+    global _queue
+    path = str(settings.POLLS_VOTE_QUEUE_PATH)
+    with _lock:
+        if _queue is None or _queue.path != path:
+            _queue = VoteQueue(path)
+        return _queue
+
+
+def enqueue_vote(user, choice):
+    """Journal a vote and make sure a worker will write it.
+
+    The voting form shows the vote at once, before it is written.
+    """
+    get_queue().put(user.pk, choice.question_id, choice.pk)
+    remember_vote(user, choice)
+    start_worker()
+
+
+def start_worker():
+    """Start the background flushing thread of this process if needed."""
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, daemon=True,
+                                       name='polls-vote-queue')
+            _worker.start()
+
+
+def _run_worker():
+    queue = get_queue()
+    while True:
+        try:
+            close_old_connections()
+            if not queue.flush():
+                time.sleep(settings.POLLS_VOTE_QUEUE_INTERVAL)
+        except Exception:
+            logger.exception("Writing queued votes failed")
+            connection.close()
+            time.sleep(settings.POLLS_VOTE_QUEUE_INTERVAL)
@@ -0,0 +1,55 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.bulk import generate, load_fixtures
+
+
+class Command(BaseCommand):
+    help = ("Load large fixture files (JSON or JSON Lines) with batched inserts "
+            "and generate synthetic polls data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*',
+                            help="Fixture files in loaddata format or JSON Lines.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        password = parser.add_mutually_exclusive_group()
+        password.add_argument('--password-hash',
+                              help="Stored password of users without one, "
+                                   "as produced by make_password().")
+        password.add_argument('--password',
+                              help="Password of users without one, hashed once.")
+        parser.add_argument('--users', type=int, default=0,
+                            help="Number of synthetic users to create.")
+        parser.add_argument('--questions', type=int, default=0,
+                            help="Number of synthetic questions to create.")
+        parser.add_argument('--choices', type=int, default=4,
+                            help="Choices per synthetic question.")
+        parser.add_argument('--votes', type=int, default=0,
+                            help="Number of synthetic votes to create.")
+        parser.add_argument('--prefix', default='user',
+                            help="Username prefix of synthetic users.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        password_hash = options['password_hash']
+        if options['password']:
+            password_hash = make_password(options['password'])
+        if options['fixtures']:
+            counts = load_fixtures(options['fixtures'], options['batch_size'],
+                                   password_hash)
+            self.report("Loaded", counts)
+        if options['users'] or options['questions'] or options['votes']:
+            try:
+                counts = generate(
+                    users=options['users'], questions=options['questions'],
+                    choices=options['choices'], votes=options['votes'],
+                    batch_size=options['batch_size'],
+                    password_hash=password_hash, prefix=options['prefix'],
+                    seed=options['seed'])
+            except ValueError as error:
+                raise CommandError(error)
+            self.report("Generated", counts)
+
+    def report(self, action, counts):
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{action} {count} {label} objects.")
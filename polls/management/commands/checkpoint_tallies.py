@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.tallies import checkpoint_tallies
+
+
+class Command(BaseCommand):
+    help = "Store a checkpoint of the tallies with the vote events since the last one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true',
+                            help="Keep taking checkpoints until interrupted.")
+        parser.add_argument('--interval', type=float, default=300,
+                            help="Seconds between checkpoints with --watch.")
+
+    def handle(self, *args, **options):
+        last_event = None
+        while True:
+            checkpoint = checkpoint_tallies()
+            if checkpoint.last_event != last_event:
+                last_event = checkpoint.last_event
+                self.stdout.write(
+                    f"Checkpoint {checkpoint.pk} includes vote events up to {last_event}.")
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
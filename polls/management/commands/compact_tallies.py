@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.models import Choice
+from polls.tallies import compact_tallies
+
+
+class Command(BaseCommand):
+    help = "Move the counts of sharded tallies into the choices' tallies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only compact choices of these questions.")
+        parser.add_argument('--watch', action='store_true',
+                            help="Keep compacting until interrupted.")
+        parser.add_argument('--interval', type=float, default=60,
+                            help="Seconds between compactions with --watch.")
+
+    def handle(self, *args, **options):
+        choices = None
+        if options['question_ids']:
+            choices = Choice.objects.filter(question_id__in=options['question_ids'])
+        while True:
+            compacted = compact_tallies(choices)
+            if compacted:
+                self.stdout.write(f"Compacted {compacted} tally shards.")
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
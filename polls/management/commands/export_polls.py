@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from polls.export import CHUNK_SIZE, EXPORTS, FORMATS
+
+
+class Command(BaseCommand):
+    help = "Export votes or results as CSV or JSON Lines in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--question', type=int, action='append',
+                            dest='question_ids',
+                            help="Only export this question, may be repeated.")
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('-o', '--output',
+                            help="Write to this file instead of standard output.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        lines = EXPORTS[options['kind']](options['question_ids'],
+                                         options['format'],
+                                         options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
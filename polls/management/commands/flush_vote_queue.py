@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.ingest import get_queue
+
+
+class Command(BaseCommand):
+    help = "Write queued votes to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.POLLS_VOTE_QUEUE_BATCH_SIZE)
+        parser.add_argument('--watch', action='store_true',
+                            help="Keep flushing until interrupted.")
+
+    def handle(self, *args, **options):
+        queue = get_queue()
+        while True:
+            written = queue.flush(options['batch_size'])
+            if written:
+                self.stdout.write(f"Wrote {written} queued votes.")
+            if not options['watch']:
+                break
+            if not written:
+                time.sleep(settings.POLLS_VOTE_QUEUE_INTERVAL)
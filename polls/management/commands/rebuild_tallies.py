@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Choice, TallyCheckpoint
+from polls.tallies import find_mismatches, rebuild_tallies, replay_tallies
+
+
+class Command(BaseCommand):
+    help = "Check or rebuild the per-choice vote tallies from Vote rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only process choices of these questions.")
+        parser.add_argument('--check', action='store_true',
+                            help="Report mismatched tallies without fixing them.")
+        parser.add_argument('--replay', action='store_true',
+                            help="Replay the vote event log from the latest checkpoint "
+                                 "instead of counting Vote rows.")
+        parser.add_argument('--checkpoint', type=int, metavar='ID',
+                            help="Replay from this checkpoint, 0 for the start of the log.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Refuse to replay when the log disagrees with the Vote "
+                                 "rows, which counts them all.")
+
+    def handle(self, *args, **options):
+        if options['replay'] or options['checkpoint'] is not None:
+            self.replay(options['checkpoint'], options['question_ids'] or None,
+                        options['verify'])
+            return
+        choices = Choice.objects.all()
+        if options['question_ids']:
+            choices = choices.filter(question_id__in=options['question_ids'])
+        mismatches = find_mismatches(choices)
+        for choice in mismatches:
+            self.stdout.write(
+                f"Question {choice.question_id}, choice {choice.pk} "
+                f"({choice.choice_text}): tally {choice.tally}, "
+                f"counted {choice.num_votes}")
+        if options['check']:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} tallies are out of date.")
+            self.stdout.write(self.style.SUCCESS("All tallies are up to date."))
+            return
+        updated = rebuild_tallies(choices)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {updated} tallies, {len(mismatches)} were out of date."))
+
+    def replay(self, checkpoint_id, question_ids, verify):
+        checkpoint = None
+        if checkpoint_id is None:
+            checkpoint = TallyCheckpoint.objects.order_by('-last_event').first()
+        elif checkpoint_id:
+            checkpoint = TallyCheckpoint.objects.filter(pk=checkpoint_id).first()
+            if checkpoint is None:
+                raise CommandError(f"Checkpoint {checkpoint_id} does not exist.")
+        try:
+            changed = replay_tallies(checkpoint, question_ids, verify)
+        except ValueError as error:
+            raise CommandError(error)
+        start = (f"vote event {checkpoint.last_event}" if checkpoint
+                 else "the start of the log")
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed the votes after {start}, {changed} tallies changed."))
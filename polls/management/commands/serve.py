@@ -0,0 +1,122 @@
+import contextlib
+import os
+import signal
+import socket
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from polls.warmup import check_shared_cache, warm_up
+
+# workers exiting sooner than this after starting are restarted with a
+# delay, doubled for every further early exit up to MAX_BACKOFF
+MIN_UPTIME = 5
+MAX_BACKOFF = 30
+
+
+class WorkerServer(ThreadedWSGIServer):
+    """Threaded WSGI server accepting on a socket opened by the parent."""
+
+    def __init__(self, sock, application):
+        super().__init__(sock.getsockname()[:2], WSGIRequestHandler,
+                         bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_address = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self.setup_environ()
+        self.set_app(application)
+
+
+class Command(BaseCommand):
+    help = ("Serve the site with several worker processes, forked after "
+            "loading the application and warming up. For production use "
+            "gunicorn with gunicorn.conf.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000',
+                            help="Address and port to listen on.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes.")
+        parser.add_argument('--no-warmup', action='store_false', dest='warmup',
+                            help="Fork without warming up first.")
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError("Worker processes need os.fork().")
+        host, _, port = options['bind'].rpartition(':')
+        if not host or not port.isdigit():
+            raise CommandError(f"{options['bind']!r} is not an address:port.")
+        workers = max(1, options['workers'])
+        try:
+            check_shared_cache(workers)
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+
+        application = get_wsgi_application()
+        if options['warmup']:
+            timings = warm_up(application)
+            self.stdout.write("Warmed up in " + ", ".join(
+                f"{step} {seconds * 1000:.0f} ms" for step, seconds in timings.items()))
+        # connections must not be shared with the forked workers
+        connections.close_all()
+        sock = socket.create_server((host, int(port)), backlog=1024)
+        self.stdout.write(f"Serving on http://{options['bind']}/ with {workers} workers.")
+        # pid -> time the worker started
+        self.children = {}
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        backoff = 0
+        try:
+            while not self.stopping:
+                while len(self.children) < workers and not self.stopping:
+                    self.spawn(sock, application)
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    continue
+                started = self.children.pop(pid, None)
+                if self.stopping or started is None:
+                    continue
+                if time.monotonic() - started >= MIN_UPTIME:
+                    backoff = 0
+                    continue
+                backoff = min(max(1, backoff * 2), MAX_BACKOFF)
+                self.stderr.write(self.style.WARNING(
+                    f"Worker {pid} exited right after starting, "
+                    f"restarting it in {backoff} s."))
+                resume = time.monotonic() + backoff
+                while not self.stopping and time.monotonic() < resume:
+                    time.sleep(0.1)
+        finally:
+            sock.close()
+            for pid in self.children:
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(pid, signal.SIGTERM)
+            for pid in self.children:
+                with contextlib.suppress(ChildProcessError):
+                    os.waitpid(pid, 0)
+
+    def spawn(self, sock, application):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            WorkerServer(sock, application).serve_forever()
+        finally:
+            os._exit(1)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.children:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.models import Question
+from polls.snapshots import discard_snapshot, get_snapshot
+
+
+class Command(BaseCommand):
+    help = "Store the final results of closed questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only snapshot these questions.")
+        parser.add_argument('--refresh', action='store_true',
+                            help="Recompute snapshots that already exist.")
+
+    def handle(self, *args, **options):
+        questions = Question.objects.filter(end_date__lt=timezone.now())
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+        if not options['refresh']:
+            questions = questions.filter(resultssnapshot__isnull=True)
+        count = 0
+        for question in questions.iterator():
+            if options['refresh']:
+                discard_snapshot(question.pk)
+            get_snapshot(question)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Stored results of {count} questions."))
@@ -0,0 +1,190 @@
+"""In-memory request metrics in the Prometheus text format.
+
+PerformanceMiddleware fills the registry for sampled requests; code that
+uses a cache reports hits and misses with record_cache().
+"""
+import contextvars
+import functools
+import threading
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import base
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# statistics of the request being measured in this context
+current = contextvars.ContextVar('polls_request_stats', default=None)
+
+
+class RequestStats:
+    """Measurements taken during one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def time_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Aggregated metrics per view name."""
+
+    HISTOGRAMS = {
+        'polls_request_duration_seconds': ("Wall time of requests.", DURATION_BUCKETS),
+        'polls_db_queries': ("Database queries per request.", QUERY_BUCKETS),
+        'polls_db_duration_seconds': ("Database time per request.", DURATION_BUCKETS),
+        'polls_template_render_seconds': ("Template render time per request.", DURATION_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.cache = {}
+
+    def record(self, view, duration, stats):
+        """Add the measurements of one request to the view's metrics."""
+        values = {
+            'polls_request_duration_seconds': duration,
+            'polls_db_queries': stats.queries,
+            'polls_db_duration_seconds': stats.db_time,
+            'polls_template_render_seconds': stats.template_time,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histogram = self.histograms[name].get(view)
+                if histogram is None:
+                    histogram = Histogram(self.HISTOGRAMS[name][1])
+                    self.histograms[name][view] = histogram
+                histogram.observe(value)
+            hits, misses = self.cache.get(view, (0, 0))
+            self.cache[view] = (hits + stats.cache_hits,
+                                misses + stats.cache_misses)
+
+    def render(self, sample_rate):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = [
+            "# HELP polls_metrics_sample_rate Fraction of requests measured.",
+            "# TYPE polls_metrics_sample_rate gauge",
+            f"polls_metrics_sample_rate {sample_rate}",
+        ]
+        with self._lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for view, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+            lines += ["# HELP polls_cache_requests_total Cache lookups by result.",
+                      "# TYPE polls_cache_requests_total counter"]
+            for view, (hits, misses) in sorted(self.cache.items()):
+                lines.append(f'polls_cache_requests_total{{view="{view}",result="hit"}} {hits}')
+                lines.append(f'polls_cache_requests_total{{view="{view}",result="miss"}} {misses}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_cache(hit):
+    """Count a cache hit or miss for the request being measured."""
+    stats = current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries of measured requests."""
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.time_query(execute, sql, params, many, context)
+
+
+def instrument_connections():
+    """Time the queries of measured requests on every database connection.
+
+    Async views query from worker threads, each with connections of its
+    own, so the wrapper is installed on every connection rather than
+    around the request.
+    """
+    connection_created.connect(_add_wrapper, dispatch_uid='polls.metrics')
+    for connection in connections.all():
+        _add_wrapper(connection=connection)
+
+
+def _add_wrapper(sender=None, connection=None, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+_instrumented = False
+
+
+def instrument_templates():
+    """Time template rendering of measured requests.
+
+    Only the outermost render is timed, so included templates are not
+    counted twice.
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    render = base.Template.render
+
+    @functools.wraps(render)
+    def timed_render(self, context):
+        stats = current.get()
+        if stats is None:
+            return render(self, context)
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - start
+
+    base.Template.render = timed_render
@@ -0,0 +1,97 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+from .metrics import (RequestStats, current, instrument_connections,
+                      instrument_templates, registry)
+from .staticfiles import index_static_files
+
+
+class PerformanceMiddleware:
+    """Measure wall time, database queries, template rendering and cache use.
+
+    A POLLS_METRICS_SAMPLE_RATE fraction of the requests to polls pages is
+    measured and aggregated per URL name; with a rate of 0 the middleware
+    is not used at all.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.POLLS_METRICS_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            # tells Django to await this middleware
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        instrument_connections()
+        instrument_templates()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        stats = RequestStats()
+        # copied into the threads running sync code for this request
+        token = current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, request, duration, stats):
+        match = request.resolver_match
+        if match is not None and match.namespace == 'polls':
+            registry.record(match.view_name, duration, stats)
+
+
+class StaticFilesMiddleware:
+    """Serve the collected static files without a separate web server.
+
+    Used when POLLS_SERVE_STATIC is set. STATIC_ROOT is indexed once at
+    start, so restart after collectstatic. Pre-compressed variants are
+    sent to clients accepting them, and content hashed names are cached
+    by browsers for a year.
+    """
+
+    def __init__(self, get_response):
+        prefix = urlparse(settings.STATIC_URL).path
+        if not settings.POLLS_SERVE_STATIC or not prefix.startswith('/'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = prefix
+        hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.files = index_static_files(settings.STATIC_ROOT, hashed_names,
+                                        settings.POLLS_STATIC_MAX_AGE)
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            static = self.files.get(request.path[len(self.prefix):])
+            if static is not None:
+                return static.response(request)
+        return self.get_response(request)
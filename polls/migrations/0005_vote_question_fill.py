@@ -0,0 +1,43 @@
+# Generated by Django 4.1 on 2026-10-18 02:10
+# Kept apart from the schema changes around it: PostgreSQL cannot alter a
+# table with pending deferred constraint checks in the same transaction.
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_vote_question(apps, schema_editor):
+    """Copy the question of each vote's choice and drop duplicate votes.
+
+    Only the latest vote of a user on a question is kept, and the
+    tallies are recounted afterwards.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question=Subquery(
+        Choice.objects.filter(pk=OuterRef('choice')).values('question')[:1]))
+    seen = set()
+    duplicates = []
+    for pk, user_id, question_id in Vote.objects.order_by('-pk').values_list(
+            'pk', 'user', 'question'):
+        if (user_id, question_id) in seen:
+            duplicates.append(pk)
+        seen.add((user_id, question_id))
+    if duplicates:
+        Vote.objects.filter(pk__in=duplicates).delete()
+        counts = (Vote.objects.filter(choice=OuterRef('pk'))
+                  .order_by().values('choice')
+                  .annotate(total=Count('pk')).values('total'))
+        Choice.objects.update(vote_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_vote_question'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_vote_question, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1 on 2026-10-18 02:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_vote_question_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultsSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='polls.question')),
+                ('results', models.JSONField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 02:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_question_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='tally_shards',
+            field=models.PositiveSmallIntegerField(default=1, help_text="Number of rows each choice's tally is spread over. Popular polls take concurrent votes faster with more shards."),
+        ),
+        migrations.CreateModel(
+            name='ChoiceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='polls.choice')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='choiceshard',
+            constraint=models.UniqueConstraint(fields=('choice', 'shard'), name='unique_shard_per_choice'),
+        ),
+    ]
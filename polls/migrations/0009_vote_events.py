@@ -0,0 +1,52 @@
+# Generated by Django 4.1 on 2026-10-18 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_existing_votes(apps, schema_editor):
+    """Start the vote event log with one event per existing vote."""
+    Vote = apps.get_model('polls', 'Vote')
+    VoteEvent = apps.get_model('polls', 'VoteEvent')
+    batch = []
+    for user_id, question_id, choice_id in Vote.objects.order_by('pk').values_list(
+            'user', 'question', 'choice').iterator():
+        batch.append(VoteEvent(user_id=user_id, question_id=question_id,
+                               new_choice_id=choice_id))
+        if len(batch) == 1000:
+            VoteEvent.objects.bulk_create(batch)
+            batch = []
+    VoteEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0008_tally_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TallyCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event', models.BigIntegerField(default=0)),
+                ('tallies', models.JSONField(default=dict)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('new_choice', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='polls.choice')),
+                ('old_choice', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(log_existing_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1 on 2026-10-18 02:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0009_vote_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tallycheckpoint',
+            name='gaps',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AlterField(
+            model_name='voteevent',
+            name='new_choice',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='polls.choice'),
+        ),
+        migrations.AlterField(
+            model_name='voteevent',
+            name='question',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='polls.question'),
+        ),
+        migrations.AlterField(
+            model_name='voteevent',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,10 +1,55 @@
 import datetime
 
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """QuerySet computing the voting status of questions in the database."""
+
+    SCHEDULED = 'scheduled'
+    OPEN = 'open'
+    CLOSED = 'closed'
+
+    def with_status(self, now=None):
+        """Annotate ``status`` and ``voting_open`` as of a single moment.
+
+        ``status`` is scheduled before pub_date, closed after end_date and
+        open in between, as can_vote() and is_closed() decide per question.
+        """
+        if now is None:
+            now = timezone.now()
+        return self.annotate(
+            status=Case(
+                When(pub_date__gt=now, then=Value(self.SCHEDULED)),
+                When(end_date__lt=now, then=Value(self.CLOSED)),
+                default=Value(self.OPEN),
+                output_field=models.CharField(),
+            ),
+            voting_open=Case(
+                When(pub_date__gt=now, then=Value(False)),
+                When(end_date__lt=now, then=Value(False)),
+                default=Value(True),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def published(self, now=None):
+        """Questions whose pub_date has passed."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open(self, now=None):
+        """Questions that can be voted on."""
+        return self.with_status(now).filter(status=self.OPEN)
+
+    def closed(self, now=None):
+        """Questions whose voting has ended."""
+        return self.with_status(now).filter(status=self.CLOSED)
+
+
 class Question(models.Model):
     """
     A model for polls Question.
@@ -17,6 +62,19 @@ class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('date ended', default=None, null=True)
+    tally_shards = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Number of rows each choice's tally is spread over. Popular "
+                  "polls take concurrent votes faster with more shards.")
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # latest questions first, and the API's cursor
+            models.Index(fields=['pub_date', 'id'],
+                         name='polls_question_pub_date_id'),
+        ]
 
     def was_published_recently(self):
         """Questoin was published less than or equal to 1 day."""
@@ -28,18 +86,79 @@ class Question(models.Model):
         now = timezone.localtime()
         return now >= self.pub_date
 
-    def can_vote(self):
+    def can_vote(self, now=None):
         """Check that Question can be vote."""
-        now = timezone.localtime()
+        if now is None:
+            now = timezone.localtime()
         if self.end_date is None and self.pub_date <= now:
             return True
         return self.pub_date <= now <= self.end_date
 
+    def is_closed(self, now=None):
+        """Check that voting on Question has ended."""
+        if now is None:
+            now = timezone.localtime()
+        return self.end_date is not None and now > self.end_date
+
+    def results(self, exact=False):
+        """Return the choices of this question with their share of the votes.
+
+        Every choice and its vote count is fetched in a single query.
+        Each choice gets ``num_votes`` and ``percentage`` attributes.
+
+        Args:
+            exact (bool): count Vote rows instead of reading the tallies
+
+        Returns:
+            dict: ``choices`` list and ``total`` number of votes
+        """
+        return _summarize(list(self._counted_choices(exact)))
+
+    async def aresults(self, exact=False):
+        """Asynchronous version of results()."""
+        return _summarize(
+            [choice async for choice in self._counted_choices(exact)])
+
+    def _counted_choices(self, exact):
+        choices = self.choice_set.order_by('pk')
+        if exact:
+            return choices.with_vote_counts()
+        return choices.with_tallies()
+
     def __str__(self):
         """Representative of Question object."""
         return self.question_text
 
 
+def _summarize(choices):
+    """Add percentages to choices annotated with num_votes."""
+    total = sum(choice.num_votes for choice in choices)
+    for choice in choices:
+        choice.percentage = (round(100 * choice.num_votes / total, 1)
+                             if total else 0)
+    return {'choices': choices, 'total': total}
+
+
+def tally_total():
+    """Expression of a choice's tally: its own count plus its shards."""
+    shards = (ChoiceShard.objects.filter(choice=OuterRef('pk'))
+              .order_by().values('choice')
+              .annotate(total=Sum('count')).values('total'))
+    return F('vote_count') + Coalesce(Subquery(shards), 0)
+
+
+class ChoiceQuerySet(models.QuerySet):
+    """QuerySet with vote count annotations for choices."""
+
+    def with_vote_counts(self):
+        """Annotate num_votes counted from the Vote rows."""
+        return self.annotate(num_votes=Count('vote'))
+
+    def with_tallies(self):
+        """Annotate num_votes read from the maintained tally."""
+        return self.annotate(num_votes=tally_total())
+
+
 class Choice(models.Model):
     """
     A model for polls choice.
@@ -49,27 +168,153 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.IntegerField(default=0, editable=False)
+
+    objects = ChoiceQuerySet.as_manager()
 
     @property
     def votes(self):
-        count = Vote.objects.filter(choice=self).count()
-        return count
+        """Number of votes for this choice, read from the maintained tally."""
+        sharded = self.shards.aggregate(total=Sum('count'))['total']
+        return self.vote_count + (sharded or 0)
 
     def __str__(self):
         """Representative of Choice object."""
         return self.choice_text
 
 
+class ChoiceShard(models.Model):
+    """
+    A part of the tally of a choice.
+
+    Votes of questions with several tally shards add to the shard picked
+    by the voter's id, so concurrent voters rarely wait for the same row.
+    Compaction moves the shard counts into Choice.vote_count.
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='unique_shard_per_choice'),
+        ]
+
+    def __str__(self):
+        """Representative of ChoiceShard object."""
+        return f"Shard {self.shard} of {self.choice}"
+
+
 class Vote(models.Model):
-    """A model for votes."""
+    """
+    A model for votes.
+
+    A user has at most one vote per question. The question is stored
+    with the vote so the vote of a user can be looked up by index.
+    """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=False)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
 
-    @property
-    def question(self):
-        return self.choice.question
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_vote_per_question'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'],
+                         name='polls_vote_question_choice'),
+        ]
 
     def __str__(self):
         """Representative of Vote object."""
         return f"Vote {self.choice.choice_text} by {self.user.username}"
+
+
+class VoteEvent(models.Model):
+    """
+    A vote being cast or changed.
+
+    Events are only appended, never changed. Replaying them in order on
+    top of a tally checkpoint gives every tally without counting votes.
+    old_choice is None for a user's first vote on the question, and
+    new_choice is None when the vote was deleted.
+    """
+
+    # not constrained, so the log stays whole when users, questions or
+    # choices are deleted
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING,
+                             db_constraint=False, related_name='+')
+    question = models.ForeignKey(Question, on_delete=models.DO_NOTHING,
+                                 db_constraint=False, related_name='+')
+    old_choice = models.ForeignKey(Choice, on_delete=models.DO_NOTHING,
+                                   db_constraint=False, null=True,
+                                   related_name='+')
+    new_choice = models.ForeignKey(Choice, on_delete=models.DO_NOTHING,
+                                   db_constraint=False, null=True,
+                                   related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Representative of VoteEvent object."""
+        return f"Vote event {self.pk} on {self.question_id}"
+
+
+class TallyCheckpoint(models.Model):
+    """
+    The tallies of all choices after a vote event.
+
+    ``tallies`` maps choice ids to their number of votes once every
+    event up to and including ``last_event`` has been applied, except
+    for the ids in ``gaps``. Those ``[first, last, seen]`` ranges were
+    missing when the checkpoint was taken, as their transactions had not
+    committed yet, and are read again by the next checkpoint.
+    """
+
+    last_event = models.BigIntegerField(default=0)
+    tallies = models.JSONField(default=dict)
+    gaps = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Representative of TallyCheckpoint object."""
+        return f"Tallies after vote event {self.last_event}"
+
+
+class ResultsSnapshot(models.Model):
+    """
+    The final results of a closed question.
+
+    Results cannot change once voting ended, so they are stored once
+    and served with HTTP caching validators.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                    primary_key=True)
+    results = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def etag(self):
+        """Entity tag of the results page rendered from this snapshot."""
+        return f'"results-{self.question_id}-{self.created.timestamp():.6f}"'
+
+    def as_results(self):
+        """Return the results in the form of Question.results()."""
+        return {
+            'total': self.results['total'],
+            'choices': [{
+                'id': choice['id'],
+                'choice_text': choice['text'],
+                'num_votes': choice['votes'],
+                'percentage': choice['percentage'],
+            } for choice in self.results['choices']],
+        }
+
+    def __str__(self):
+        """Representative of ResultsSnapshot object."""
+        return f"Results of {self.question}"
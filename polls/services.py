@@ -0,0 +1,186 @@
+"""Write paths shared by the polls views."""
+from collections import Counter
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .broadcast import broadcaster
+from .cache import invalidate_results, remember_vote
+from .models import Choice, ChoiceShard, Question, Vote, VoteEvent
+from .snapshots import discard_snapshot
+
+# attempts made when a concurrent first vote by the same user wins the insert
+VOTE_ATTEMPTS = 3
+
+
+def tally_shard(user_id, shards):
+    """Return the tally shard a user's votes go to, None when unsharded."""
+    return user_id % shards if shards > 1 else None
+
+
+def add_to_tally(choice_id, amount, shard=None):
+    """Atomically add amount to the tally of a choice or to one of its shards."""
+    if shard is None:
+        Choice.objects.filter(pk=choice_id).update(
+            vote_count=F('vote_count') + amount)
+        return
+    shards = ChoiceShard.objects.filter(choice_id=choice_id, shard=shard)
+    if not shards.update(count=F('count') + amount):
+        # first vote in this shard, a concurrent one may create it as well
+        ChoiceShard.objects.bulk_create(
+            [ChoiceShard(choice_id=choice_id, shard=shard)],
+            ignore_conflicts=True)
+        shards.update(count=F('count') + amount)
+
+
+def record_vote(user, choice):
+    """Record the vote of user for choice, replacing an earlier vote.
+
+    The vote and the tallies change in one transaction, so concurrent
+    submissions by the same user (double clicks, several tabs) leave
+    exactly one vote and consistent tallies.
+
+    Args:
+        user (User): the voter
+        choice (Choice): the selected choice
+
+    Returns:
+        int: id of the previously voted choice, or None for a first vote
+    """
+    for attempt in range(1, VOTE_ATTEMPTS + 1):
+        try:
+            return _record_vote(user, choice)
+        except (IntegrityError, OperationalError):
+            # a concurrent first vote won the insert, or a lock timed out
+            if attempt == VOTE_ATTEMPTS:
+                raise
+
+
+def _record_vote(user, choice):
+    votes = Vote.objects.filter(user=user, question_id=choice.question_id)
+    shard = tally_shard(user.pk, choice.question.tally_shards)
+    with transaction.atomic():
+        previous_choice_id = _lock_votes(votes).get((user.pk, choice.question_id))
+        if previous_choice_id == choice.pk:
+            return previous_choice_id
+        if previous_choice_id is None:
+            # raises IntegrityError if a concurrent first vote was committed
+            Vote.objects.create(user=user, question_id=choice.question_id,
+                                choice=choice)
+        else:
+            votes.update(choice=choice)
+        tallies = Counter({(choice.pk, shard): 1})
+        if previous_choice_id is not None:
+            tallies[previous_choice_id, shard] -= 1
+        _change_tallies(tallies)
+        VoteEvent.objects.create(user=user, question_id=choice.question_id,
+                                 old_choice_id=previous_choice_id,
+                                 new_choice=choice)
+        publish_results(choice.question_id)
+        transaction.on_commit(lambda: remember_vote(user, choice))
+    return previous_choice_id
+
+
+def lock_rows(queryset, field):
+    """Return a queryset locking its rows until the transaction ends.
+
+    SQLite has no row locks, so a write of field that changes nothing
+    takes the database lock instead. Either way the rows are locked
+    before the returned queryset reads them.
+    """
+    if not connection.features.has_select_for_update:
+        queryset.update(**{field: F(field)})
+    return queryset.select_for_update()
+
+
+def _lock_votes(votes):
+    """Lock the votes of a queryset and return their choice ids.
+
+    Concurrent votes of the same user wait for each other.
+
+    Returns:
+        dict: choice id per (user id, question id)
+    """
+    return {(user_id, question_id): choice_id
+            for user_id, question_id, choice_id in lock_rows(votes, 'choice_id')
+            .values_list('user_id', 'question_id', 'choice_id')}
+
+
+def _change_tallies(tallies):
+    """Add to the tallies of (choice id, shard) pairs.
+
+    Rows are updated in the order of their choice ids, so transactions
+    changing the same tallies lock them in the same order and cannot
+    deadlock.
+    """
+    for (choice_id, shard), amount in sorted(
+            tallies.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        if amount:
+            add_to_tally(choice_id, amount, shard)
+
+
+def publish_results(question_id):
+    """Tell results watchers about new votes once the transaction commits."""
+    def publish():
+        invalidate_results(question_id)
+        broadcaster.publish(question_id)
+    transaction.on_commit(publish)
+
+
+def record_votes(votes):
+    """Record a batch of votes, the last one of a user on a question wins.
+
+    Tallies are changed once per affected choice rather than per vote.
+    Queued votes may be written after their poll closed, so the stored
+    results of closed questions are discarded.
+
+    Args:
+        votes: iterable of (user_id, question_id, choice_id) in the order
+            the votes were cast
+    """
+    latest = {}
+    for user_id, question_id, choice_id in votes:
+        latest[user_id, question_id] = choice_id
+    if not latest:
+        return
+    user_ids = {user_id for user_id, _ in latest}
+    question_ids = {question_id for _, question_id in latest}
+    questions = {pk: Question(pk=pk, tally_shards=shards, end_date=end_date)
+                 for pk, shards, end_date in Question.objects.filter(
+                     pk__in=question_ids).values_list('pk', 'tally_shards', 'end_date')}
+
+    with transaction.atomic():
+        previous = {
+            key: choice_id for key, choice_id in _lock_votes(Vote.objects.filter(
+                user_id__in=user_ids, question_id__in=question_ids)).items()
+            if key in latest
+        }
+        changed = {key: choice_id for key, choice_id in latest.items()
+                   if previous.get(key) != choice_id}
+        # conflict fields are given by column for Django 4.1
+        Vote.objects.bulk_create(
+            [Vote(user_id=user_id, question_id=question_id, choice_id=choice_id)
+             for (user_id, question_id), choice_id in changed.items()],
+            update_conflicts=True,
+            unique_fields=['user_id', 'question_id'],
+            update_fields=['choice_id'],
+        )
+        VoteEvent.objects.bulk_create(
+            [VoteEvent(user_id=user_id, question_id=question_id,
+                       old_choice_id=previous.get((user_id, question_id)),
+                       new_choice_id=choice_id)
+             for (user_id, question_id), choice_id in changed.items()])
+        tallies = Counter()
+        for (user_id, question_id), choice_id in changed.items():
+            question = questions.get(question_id)
+            shard = tally_shard(user_id, question.tally_shards if question else 1)
+            tallies[choice_id, shard] += 1
+            if (user_id, question_id) in previous:
+                tallies[previous[user_id, question_id], shard] -= 1
+        _change_tallies(tallies)
+        now = timezone.now()
+        for question_id in question_ids:
+            publish_results(question_id)
+            if question_id in questions and questions[question_id].is_closed(now):
+                transaction.on_commit(lambda pk=question_id: discard_snapshot(pk))
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import user_cache
+from .cache import forget_vote, invalidate_index, invalidate_question
+from .models import Choice, Question, Vote, VoteEvent
+from .services import add_to_tally, publish_results, tally_shard
+from .snapshots import discard_snapshot
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, created=False, **kwargs):
+    """Questions shown on the index and stored results may have changed."""
+    invalidate_index()
+    invalidate_question(instance.pk)
+    if not created:
+        discard_snapshot(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """The detail and results pages of the question have changed."""
+    invalidate_question(instance.question_id)
+    discard_snapshot(instance.question_id)
+
+
+@receiver(post_save, sender=Vote)
+def vote_loaded(sender, instance, created, raw, **kwargs):
+    """Log the votes of fixtures, which are saved as they are."""
+    if raw and created:
+        VoteEvent.objects.create(user_id=instance.user_id,
+                                 question_id=instance.question_id,
+                                 new_choice_id=instance.choice_id)
+
+
+@receiver(post_delete, sender=Vote)
+def vote_deleted(sender, instance, **kwargs):
+    """Take a deleted vote, also one deleted with its user, off the tally."""
+    VoteEvent.objects.create(user_id=instance.user_id,
+                             question_id=instance.question_id,
+                             old_choice_id=instance.choice_id)
+    forget_vote(instance.user_id, instance.question_id)
+    shards = (Choice.objects.filter(pk=instance.choice_id)
+              .values_list('question__tally_shards', flat=True).first())
+    if shards is None:
+        # the choice was deleted as well
+        return
+    add_to_tally(instance.choice_id, -1, tally_shard(instance.user_id, shards))
+    publish_results(instance.question_id)
+    discard_snapshot(instance.question_id)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """Sessions of the user must load the changed user."""
+    user_cache.discard(instance.pk)
@@ -0,0 +1,64 @@
+"""Stored results of closed polls, served with HTTP validators."""
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .broadcast import results_payload
+from .models import ResultsSnapshot
+
+
+def _cache_key(question_id):
+    return f'polls:snapshot:{question_id}'
+
+
+def get_snapshot(question):
+    """Return the results snapshot of a closed question, creating it once."""
+    try:
+        snapshot = ResultsSnapshot.objects.get(question=question)
+    except ResultsSnapshot.DoesNotExist:
+        try:
+            snapshot = ResultsSnapshot.objects.create(
+                question=question, results=results_payload(question.pk))
+        except IntegrityError:
+            # another request stored it first
+            snapshot = ResultsSnapshot.objects.get(question=question)
+    cache.set(_cache_key(question.pk), (snapshot.etag, snapshot.created), None)
+    return snapshot
+
+
+def not_modified(request, question_id):
+    """Answer a conditional request for snapshot results without a query.
+
+    Returns:
+        HttpResponse: 304 Not Modified when the client's copy is current,
+            None when the page has to be rendered
+    """
+    validators = cache.get(_cache_key(question_id))
+    if validators is None:
+        return None
+    etag, created = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(created.timestamp()))
+    if isinstance(response, HttpResponseNotModified):
+        return add_snapshot_headers(response, etag, created)
+    return None
+
+
+def add_snapshot_headers(response, etag, created):
+    """Let caches keep a response rendered from a snapshot.
+
+    They revalidate it on every use, which not_modified() answers
+    without a query, so discarded snapshots are never served stale.
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(created.timestamp())
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def discard_snapshot(question_id):
+    """Forget the snapshot of a question whose details changed."""
+    ResultsSnapshot.objects.filter(question_id=question_id).delete()
+    cache.delete(_cache_key(question_id))
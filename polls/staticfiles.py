@@ -0,0 +1,122 @@
+"""Production pipeline for static files.
+
+collectstatic with CompressedManifestStaticFilesStorage writes content
+hashed copies of every file and gzip (and, with the brotli package,
+brotli) variants of the text files. StaticFilesMiddleware serves them
+from an index built once per process, with far-future cache headers for
+hashed names.
+"""
+import gzip
+import mimetypes
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.txt', '.html', '.json',
+                '.xml', '.ico')
+# preferred encoding first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def compress_file(path):
+    """Write the gzip and brotli variants of a file that are smaller."""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as stream:
+                stream.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also pre-compresses the hashed text files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if (not dry_run and hashed_name
+                    and not isinstance(processed, Exception)
+                    and hashed_name.endswith(COMPRESSIBLE)):
+                compress_file(self.path(hashed_name))
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    """A collected file, its compressed variants and its cache headers."""
+
+    def __init__(self, path, max_age):
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        stat = os.stat(path)
+        self.last_modified = int(stat.st_mtime)
+        self.representations = [
+            (coding, path + suffix) for coding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        ] + [(None, path)]
+        self.tag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+        self.cache_control = (IMMUTABLE if max_age is None
+                              else f'public, max-age={max_age}')
+
+    def response(self, request):
+        """Answer a GET or HEAD request with the best representation."""
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        coding, path = next((coding, path) for coding, path in self.representations
+                            if coding is None or coding in accepted)
+        etag = f'"{self.tag}-{coding}"' if coding else f'"{self.tag}"'
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=self.last_modified)
+        if response is None:
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=self.content_type)
+                response['Content-Length'] = os.path.getsize(path)
+            else:
+                response = FileResponse(open(path, 'rb'),
+                                        content_type=self.content_type,
+                                        filename=os.path.basename(self.path))
+            if coding:
+                response['Content-Encoding'] = coding
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(self.last_modified)
+        response['Cache-Control'] = self.cache_control
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def index_static_files(root, hashed_names, max_age):
+    """Return the StaticFile of every collected file by its relative URL.
+
+    Files whose names are in hashed_names never change and are cached
+    for a year; the others for max_age seconds.
+    """
+    files = {}
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(suffixes):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(
+                path, None if name in hashed_names else max_age)
+    return files
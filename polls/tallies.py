@@ -0,0 +1,241 @@
+"""Maintenance of the denormalized per-choice vote tallies."""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (Choice, ChoiceShard, ResultsSnapshot, TallyCheckpoint, Vote,
+                     VoteEvent, tally_total)
+from .services import lock_rows, publish_results
+from .snapshots import discard_snapshot
+
+# Event ids missing for longer than this belong to transactions that
+# rolled back, and checkpoints stop looking for them.
+GAP_LIFETIME = datetime.timedelta(hours=1)
+
+
+def counted_votes():
+    """Subquery expression counting the Vote rows of the outer choice."""
+    counts = (Vote.objects.filter(choice=OuterRef('pk'))
+              .order_by().values('choice')
+              .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def find_mismatches(choices=None):
+    """Return choices whose tally differs from their actual vote count.
+
+    Each returned choice has ``tally`` set to its tally, shards included,
+    and ``num_votes`` set to the number of Vote rows.
+    """
+    if choices is None:
+        choices = Choice.objects.all()
+    return list(choices.annotate(tally=tally_total()).with_vote_counts()
+                .exclude(tally=F('num_votes'))
+                .order_by('question_id', 'pk'))
+
+
+def rebuild_tallies(choices=None):
+    """Recount the tally of every choice from Vote rows.
+
+    Stored results of the questions are discarded, as they may have been
+    taken from wrong tallies.
+
+    Returns:
+        int: number of choices updated
+    """
+    if choices is None:
+        choices = Choice.objects.all()
+    with transaction.atomic():
+        ChoiceShard.objects.filter(choice__in=choices).update(count=0)
+        updated = choices.update(vote_count=counted_votes())
+        for question_id in (ResultsSnapshot.objects.filter(question__choice__in=choices)
+                            .values_list('question_id', flat=True).distinct()):
+            discard_snapshot(question_id)
+    return updated
+
+
+def compact_tallies(choices=None):
+    """Move the counts of tally shards into their choices' tallies.
+
+    Shards are locked while they are read, and each is decreased by the
+    amount read, so concurrent votes are neither lost nor counted twice.
+
+    Returns:
+        int: number of shards compacted
+    """
+    shards = ChoiceShard.objects.exclude(count=0)
+    if choices is not None:
+        shards = shards.filter(choice__in=choices)
+    moved = Counter()
+    with transaction.atomic():
+        rows = list(shards.select_for_update().order_by('pk')
+                    .values_list('pk', 'choice_id', 'count'))
+        for pk, choice_id, count in rows:
+            ChoiceShard.objects.filter(pk=pk).update(count=F('count') - count)
+            moved[choice_id] += count
+        for choice_id, count in moved.items():
+            Choice.objects.filter(pk=choice_id).update(
+                vote_count=F('vote_count') + count)
+    return len(rows)
+
+
+def replay_events(tallies, after=0, questions=None, gaps=None, chunk_size=2000):
+    """Apply the vote events following an event to tallies, in order.
+
+    Args:
+        tallies (Counter): votes per choice id, changed in place
+        after (int): id of the last event tallies already include
+        questions: only apply the events of these question ids
+        gaps (list): missing event ids are appended to it as
+            ``[first, last]`` ranges
+        chunk_size (int): events read per query
+
+    Returns:
+        int: id of the last event applied, after when there were none
+    """
+    events = VoteEvent.objects.order_by('pk')
+    if questions is not None:
+        events = events.filter(question_id__in=questions)
+    while True:
+        rows = list(events.filter(pk__gt=after).values_list(
+            'pk', 'old_choice_id', 'new_choice_id')[:chunk_size])
+        for pk, old_choice_id, new_choice_id in rows:
+            if gaps is not None and pk > after + 1:
+                gaps.append([after + 1, pk - 1])
+            _apply(tallies, old_choice_id, new_choice_id)
+            after = pk
+        if len(rows) < chunk_size:
+            return after
+
+
+def _apply(tallies, old_choice_id, new_choice_id):
+    if new_choice_id is not None:
+        tallies[new_choice_id] += 1
+    if old_choice_id is not None:
+        tallies[old_choice_id] -= 1
+
+
+def replay_gaps(tallies, gaps, questions=None, expired=None):
+    """Apply the events that were committed into gaps of the log since.
+
+    Args:
+        tallies (Counter): votes per choice id, changed in place
+        gaps (list): ``[first, last, seen]`` ranges of missing event ids
+        questions: only apply the events of these question ids
+        expired (float): timestamp before which gaps are given up
+
+    Returns:
+        list: the ranges still missing
+    """
+    remaining = []
+    for first, last, seen in gaps:
+        events = VoteEvent.objects.filter(pk__range=(first, last))
+        rows = list(events.order_by('pk').values_list(
+            'pk', 'question_id', 'old_choice_id', 'new_choice_id'))
+        for pk, question_id, old_choice_id, new_choice_id in rows:
+            if questions is None or question_id in questions:
+                _apply(tallies, old_choice_id, new_choice_id)
+        if expired is not None and seen < expired:
+            continue
+        for pk, *_ in rows:
+            if pk > first:
+                remaining.append([first, pk - 1, seen])
+            first = pk + 1
+        if first <= last:
+            remaining.append([first, last, seen])
+    return remaining
+
+
+def _checkpoint_state(checkpoint):
+    if checkpoint is None:
+        return Counter(), 0, []
+    tallies = Counter({int(pk): count for pk, count in checkpoint.tallies.items()})
+    return tallies, checkpoint.last_event, checkpoint.gaps
+
+
+def checkpoint_tallies(gap_lifetime=GAP_LIFETIME):
+    """Store the latest checkpoint with the vote events since applied.
+
+    Only the events after the latest checkpoint and those missing from
+    it are read, so the cost grows with the number of new votes rather
+    than with all votes.
+
+    Returns:
+        TallyCheckpoint: the new checkpoint, or the latest one when there
+            were no new events
+    """
+    latest = TallyCheckpoint.objects.order_by('-last_event').first()
+    tallies, after, gaps = _checkpoint_state(latest)
+    now = timezone.now().timestamp()
+    remaining = replay_gaps(tallies, gaps,
+                            expired=now - gap_lifetime.total_seconds())
+    new_gaps = []
+    last_event = replay_events(tallies, after, gaps=new_gaps)
+    remaining += [[first, last, now] for first, last in new_gaps]
+    if latest is not None and last_event == after and remaining == gaps:
+        return latest
+    return TallyCheckpoint.objects.create(
+        last_event=last_event,
+        tallies={str(pk): count for pk, count in tallies.items() if count},
+        gaps=remaining)
+
+
+def _lock_tallies(choices):
+    """Lock the tallies of choices, with their shards, until the commit."""
+    list(lock_rows(choices, 'vote_count').order_by('pk').values_list('pk'))
+    list(ChoiceShard.objects.filter(choice__in=choices).select_for_update()
+         .order_by('choice_id', 'shard').values_list('pk'))
+
+
+def replay_tallies(checkpoint=None, questions=None, verify=False):
+    """Rebuild tallies from a checkpoint and the vote events after it.
+
+    Choices whose tally changes get the replayed count with their shards
+    emptied, and the stored results of their questions are discarded.
+    The tallies are locked meanwhile, so concurrent votes wait.
+
+    Args:
+        checkpoint (TallyCheckpoint): where to start, None for the
+            start of the log
+        questions: only rebuild the choices of these question ids
+        verify (bool): count the Vote rows too and refuse to rebuild
+            when the log disagrees with them
+
+    Returns:
+        int: number of tallies changed
+
+    Raises:
+        ValueError: verify is set and the replayed tallies differ from
+            the Vote rows, as votes were written without logging events
+    """
+    tallies, after, gaps = _checkpoint_state(checkpoint)
+    choices = Choice.objects.all()
+    if questions is not None:
+        choices = choices.filter(question_id__in=questions)
+    with transaction.atomic():
+        _lock_tallies(choices)
+        replay_gaps(tallies, gaps, questions)
+        replay_events(tallies, after, questions)
+        if verify:
+            differing = sum(counted != tallies[pk] for pk, counted in choices.annotate(
+                counted=counted_votes()).values_list('pk', 'counted'))
+            if differing:
+                raise ValueError(
+                    f"The vote event log disagrees with the votes of {differing} "
+                    "choices; rebuild the tallies without replaying.")
+        changed = []
+        for pk, question_id, tally in choices.with_tallies().values_list(
+                'pk', 'question_id', 'num_votes'):
+            if tally != tallies[pk]:
+                changed.append(Choice(pk=pk, question_id=question_id,
+                                      vote_count=tallies[pk]))
+        ChoiceShard.objects.filter(choice__in=changed).update(count=0)
+        Choice.objects.bulk_update(changed, ['vote_count'], batch_size=1000)
+        for question_id in {choice.question_id for choice in changed}:
+            discard_snapshot(question_id)
+            publish_results(question_id)
+    return len(changed)
@@ -1,11 +1,27 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api
+from . import views as sync_views
+
+if settings.POLLS_ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    views = sync_views
 
 app_name = 'polls'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('<int:pk>/', views.DetailView.as_view(), name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
+    # streamed under WSGI; one event per request under ASGI
+    path('<int:pk>/results/stream/', sync_views.results_stream,
+         name='results_stream'),
     path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('export/<str:kind>/', sync_views.export, name='export'),
+    path('api/questions/', api.question_list, name='api_questions'),
+    path('api/questions/<int:pk>/', api.question_detail, name='api_question'),
+    path('api/questions/<int:pk>/choices/', api.choice_list,
+         name='api_choices'),
+    path('api/questions/<int:pk>/results/', api.results, name='api_results'),
 ]
@@ -1,13 +1,30 @@
-from django.http import HttpResponseRedirect
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseBadRequest,
+                         HttpResponseRedirect, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from .models import Choice, Question, Vote
+from .broadcast import broadcaster
+from .cache import (cached_question_version, get_index_questions, get_my_vote,
+                    get_question_detail, question_version)
+from .conditional import detail_etag, index_etag, results_etag
+from .export import EXPORTS, FORMATS
+from .ingest import enqueue_vote
+from .metrics import registry
+from .models import Choice, Question
+from .services import record_vote
+from .snapshots import add_snapshot_headers, get_snapshot, not_modified
 
 
 class IndexView(generic.ListView):
@@ -16,13 +33,25 @@ class IndexView(generic.ListView):
     template_name = 'polls/index.html'
     context_object_name = 'latest_question_list'
 
+    def get(self, request, *args, **kwargs):
+        """Answer 304 Not Modified when the listed questions are unchanged.
+
+        The cached question list gives the ETag and is reused for the page.
+        """
+        self.questions = get_index_questions()
+        etag = index_etag(request, self.questions)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            response['ETag'] = etag
+        return response
+
     def get_queryset(self):
         """
         Return the last five published questions (not including those set to be
         published in the future).
         """
-        question_object = Question.objects.filter(pub_date__lte=timezone.now())
-        return question_object.order_by('-pub_date')[:5]
+        return self.questions
 
 
 class DetailView(LoginRequiredMixin, generic.DetailView):
@@ -53,30 +82,109 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
             httpresponse: response for the request
         """
         user = request.user
-        try:
-            self.q = Question.objects.get(pk=pk)
-            if self.q.can_vote():
-                try:
-                    vote = Vote.objects.get(user=user, choice__question=self.q)
-                    self.voted = vote.choice.choice_text
-                except Vote.DoesNotExist:
-                    self.voted = ""
-                return render(request, 'polls/detail.html', {
-                    'question': self.q,
-                    'voted': self.voted
-                })
-            else:
-                messages.error(request, "Voting is not allowed at this time.")
-                return HttpResponseRedirect(reverse('polls:index'))
-        except Question.DoesNotExist:
+        detail = get_question_detail(pk)
+        if detail is None:
             messages.error(request, "Question does not exist.")
             return HttpResponseRedirect(reverse('polls:index'))
+        self.q, choices, version = detail
+        if not self.q.can_vote():
+            messages.error(request, "Voting is not allowed at this time.")
+            return HttpResponseRedirect(reverse('polls:index'))
+        self.voted = get_my_vote(user, self.q.pk)
+        # both come from the cache, so an unchanged form costs no queries
+        etag = detail_etag(request, version, self.voted)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        response = render(request, 'polls/detail.html', {
+            'question': self.q,
+            'choices': choices,
+            'voted': self.voted,
+            # the choice list is rendered once per details version and previous vote
+            'version': version,
+            'cache_timeout': settings.POLLS_QUESTION_CACHE_TIMEOUT,
+        })
+        if etag is not None:
+            response['ETag'] = etag
+        return response
 
 
-class ResultsView(generic.DeleteView):
+class ResultsView(generic.DetailView):
     """View for results.html page."""
     model = Question
     template_name = 'polls/results.html'
+    snapshot = None
+
+    def get(self, request, *args, **kwargs):
+        """Answer 304 Not Modified when the client's copy is current."""
+        pk = kwargs['pk']
+        etag = results_etag(cached_question_version(pk))
+        return (get_conditional_response(request, etag=etag)
+                or not_modified(request, pk)
+                or super().get(request, *args, **kwargs))
+
+    def get_object(self, queryset=None):
+        """Return the question and take its version before the results.
+
+        A vote counted while the results are computed then leaves the
+        page tagged with the older version instead of the newer one.
+        """
+        question = super().get_object(queryset)
+        self.version = question_version(question)
+        return question
+
+    def get_context_data(self, **kwargs):
+        """Add the choices with their vote counts and percentages.
+
+        The results of closed questions come from their snapshot.
+        """
+        context = super().get_context_data(**kwargs)
+        if self.object.is_closed():
+            self.snapshot = get_snapshot(self.object)
+            context['results'] = self.snapshot.as_results()
+            context['closed'] = True
+        else:
+            context['results'] = self.object.results()
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if self.snapshot is not None:
+            add_snapshot_headers(response, self.snapshot.etag,
+                                 self.snapshot.created)
+        else:
+            response['ETag'] = results_etag(self.version)
+        return response
+
+
+def results_stream(request, pk):
+    """Stream the results of a question as server-sent events.
+
+    Django runs the iterator of a streaming response in the event loop
+    of an ASGI server, so there the current results are sent as one
+    event and the browser polls by reconnecting.
+
+    Args:
+        request : http request
+        pk (int): question id
+
+    Returns:
+        httpresponse: a text/event-stream response
+    """
+    question = get_object_or_404(Question, pk=pk)
+    if isinstance(request, ASGIRequest):
+        broadcaster.refresh(question.id)
+        _, payload = broadcaster.snapshot(question.id)
+        response = HttpResponse(
+            'retry: 1000\n\n'
+            f'event: results\ndata: {json.dumps(payload)}\n\n',
+            content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(broadcaster.stream(question.id),
+                                         content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
@@ -94,23 +202,72 @@ def vote(request, question_id):
     if not user.is_authenticated:
         return redirect('login')
     question = get_object_or_404(Question, pk=question_id)
+    if not question.can_vote():
+        messages.error(request, "Voting is not allowed at this time.")
+        return HttpResponseRedirect(reverse('polls:index'))
     try:
         selected_choice = question.choice_set.get(pk=request.POST['choice'])
     except (KeyError, Choice.DoesNotExist):
         return render(request, 'polls/detail.html', {
             'question': question,
+            'choices': question.choice_set.all(),
             'error_message': "You didn't select a choice.",
         })
     else:
-        # change vote and save it
-        try:
-            user_vote = Vote.objects.get(user=user, choice__question=question)
-            if user_vote:
-                user_vote.choice = selected_choice
-                user_vote.save()
-        # new vote and save it
-        except Vote.DoesNotExist:
-            new_vote = Vote.objects.create(user=user, choice=selected_choice)
-            new_vote.save()
+        if settings.POLLS_VOTE_INGESTION == 'queue':
+            enqueue_vote(user, selected_choice)
+        else:
+            record_vote(user, selected_choice)
         return HttpResponseRedirect(reverse('polls:results',
                                             args=(question.id,)))
+
+
+@staff_member_required
+def metrics(request):
+    """Return the request metrics in the Prometheus text format.
+
+    Args:
+        request : http request
+
+    Returns:
+        httpresponse: metrics of the sampled requests
+    """
+    return HttpResponse(registry.render(settings.POLLS_METRICS_SAMPLE_RATE),
+                        content_type='text/plain; version=0.0.4')
+
+
+@staff_member_required
+def export(request, kind):
+    """Stream the votes or results of every question, or of some.
+
+    Under ASGI the export is written to a temporary file first, as Django
+    would read the rows in the event loop while streaming.
+
+    Args:
+        request : http request with the optional ``question`` (repeatable)
+            and ``format`` (csv or jsonl) query parameters
+        kind (str): votes or results
+
+    Returns:
+        httpresponse: the export as a file download
+    """
+    if kind not in EXPORTS:
+        raise Http404("No such export.")
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest("Unknown format.")
+    try:
+        question_ids = [int(pk) for pk in request.GET.getlist('question')]
+    except ValueError:
+        return HttpResponseBadRequest("Invalid question id.")
+    lines = EXPORTS[kind](question_ids, fmt)
+    if isinstance(request, ASGIRequest):
+        export_file = tempfile.TemporaryFile()
+        for line in lines:
+            export_file.write(line.encode())
+        export_file.seek(0)
+        return FileResponse(export_file, as_attachment=True,
+                            filename=f'{kind}.{fmt}', content_type=FORMATS[fmt])
+    response = StreamingHttpResponse(lines, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
@@ -0,0 +1,92 @@
+"""Work done once before serving, so the first requests are not slow.
+
+The serve command and gunicorn.conf.py warm up before forking their
+workers, which then share the loaded modules, compiled templates and the
+code paths run once by sample requests. The questions are stored in the
+configured cache, which workers must share.
+"""
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from .cache import get_index_questions, get_question_detail
+
+TEMPLATES = (
+    'polls/index.html',
+    'polls/detail.html',
+    'polls/choices.html',
+    'polls/results.html',
+    'registration/login.html',
+)
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def check_shared_cache(workers):
+    """Refuse a cache that several worker processes would each keep apart.
+
+    The version tokens behind the ETags would differ per worker, which
+    then answer 304 Not Modified for pages that changed elsewhere.
+
+    Raises:
+        ImproperlyConfigured: workers > 1 with a process-local cache
+    """
+    if workers > 1 and settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            "The cache is not shared between worker processes. Set CACHE_BACKEND "
+            "to a file, database or memcached backed cache, or use one worker.")
+
+
+def warm_up(application=None):
+    """Import every view, compile the templates and cache the open polls.
+
+    Args:
+        application: WSGI application to send a request for each public
+            page, which loads what the pages need on first use
+
+    Returns:
+        dict: seconds spent on each step
+    """
+    timings = {}
+    start = time.perf_counter()
+    # resolving the patterns imports the view modules
+    get_resolver().reverse_dict
+    timings['urls'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in TEMPLATES:
+        # kept by the cached template loader when DEBUG is off
+        get_template(name)
+    timings['templates'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    questions = [question for question in get_index_questions()
+                 if question.voting_open]
+    for question in questions:
+        get_question_detail(question.pk)
+    timings['cache'] = time.perf_counter() - start
+
+    if application is not None:
+        start = time.perf_counter()
+        paths = [reverse('polls:index'), reverse('login')]
+        if questions:
+            paths.append(reverse('polls:results', args=(questions[0].pk,)))
+        for path in paths:
+            _get(application, path)
+        timings['requests'] = time.perf_counter() - start
+    return timings
+
+
+def _get(application, path):
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    environ = {'PATH_INFO': path, 'HTTP_HOST': hosts[0] if hosts else 'localhost'}
+    setup_testing_defaults(environ)
+    response = application(environ, lambda status, headers, exc_info=None: None)
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()